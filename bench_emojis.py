@@ -0,0 +1,59 @@
+"""
+Times the lookups of `StandardEmojis.code` (used by the converters) for
+emoji lists of growing size, they should stay flat.
+
+    python bench_emojis.py
+"""
+import random
+import timeit
+
+from katbot.cogs.utils import datapath_container
+
+# Sizes of the synthetic lists, after one the size of the real list
+SIZES = (1000, 10000, 100000)
+LOOKUPS = 2000
+REPEAT = 5
+
+
+def synthetic_emojis(count, rng):
+    emojis = set()
+    while len(emojis) < count:
+        # one to four codepoints of the emoji blocks, sometimes with a variation selector
+        emoji = "".join(chr(rng.randint(0x1f300, 0x1f5ff)) for _ in range(rng.randint(1, 4)))
+        if rng.random() < 0.3:
+            emoji += "\ufe0f"
+        emojis.add(emoji)
+    return sorted(emojis)
+
+
+def bench(emojis_cls, count, rng):
+    emojis = synthetic_emojis(count, rng)
+    index = emojis_cls(emojis)
+    known = rng.sample(emojis, min(LOOKUPS, len(emojis)))
+
+    cases = {
+        "exact": known,
+        "selector": [e.replace("\ufe0f", "") + "\ufe0f" for e in known],
+        "skin tone": [e + "\U0001f3fd" for e in known],
+        "unknown": ["a" + e for e in known],
+    }
+    results = {}
+    for name, items in cases.items():
+        best = min(timeit.repeat(lambda: [index.code(i) for i in items], number=1, repeat=REPEAT))
+        results[name] = best / len(items) * 1e6
+    return results
+
+
+def main():
+    datapath_container.setfile(__file__)
+    from katbot.cogs.utils.emojis import EMOJIS, StandardEmojis
+
+    rng = random.Random(0)
+    print(f"{'emojis':>8}  " + "  ".join(f"{name:>12}" for name in ("exact", "selector", "skin tone", "unknown")))
+    for count in (len(EMOJIS),) + SIZES:
+        results = bench(StandardEmojis, count, rng)
+        print(f"{count:>8}  " + "  ".join(f"{us:>10.2f}us" for us in results.values()))
+
+
+if __name__ == "__main__":
+    main()
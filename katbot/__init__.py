@@ -1,15 +1,13 @@
 import asyncio
-import concurrent.futures
 import io
 import logging
 import os
-import socket
 import sys
 import time
 import traceback
-from collections import defaultdict
 from contextlib import contextmanager, suppress
 from datetime import datetime
+from json import loads as json_loads
 
 import aiohttp
 import discord
@@ -17,15 +15,16 @@ from async_timeout import timeout as Timeout
 from discord.ext import commands
 
 from .cogs.utils import BINS, SgetError, context, ctimestamp
+from .cogs.utils.emoji_index import GuildEmojiIndex
+from .cogs.utils.http import Connections, HttpCache, check_image_size, read_limited
+from .cogs.utils.metrics import Metrics
+from .cogs.utils.paginator import PaginatorRegistry
+from .cogs.utils.pools import Pools
+from .cogs.utils.recent import RecentImages
+from .cogs.utils.scheduler import Scheduler
+from .cogs.utils.snipe import SnipeStore
 from config import BOT_PREFIX, STATUS, TOKEN
 
-try:
-    import aiodns
-except ImportError:
-    aiodns = False
-
-Resolver = aiohttp.AsyncResolver if aiodns else aiohttp.ThreadedResolver
-
 # We set up logging...
 @contextmanager
 def setup_log():
@@ -65,20 +64,29 @@ class KatBOT(commands.Bot):
     """
 
     def __init__(self):
+        loop = asyncio.get_event_loop()
+        # Bumped when commands are added or removed (used by the help), before super() adds the help command
+        self.commands_version = 0
+        # One connection pool for discord.py and our own session
+        self.connections = Connections(loop)
         super().__init__(
             command_prefix=self._get_prefix,
             description="Un bot fait par ItsKat#8668",
-            connector=aiohttp.TCPConnector(
-                resolver=Resolver(),
-                family=socket.AF_INET,
-                ttl_dns_cache=120
-            )
+            loop=loop,
+            connector=self.connections.get_connector()
         )
         self.session = None  # Filled in later
-
-        self.snipe_data = {}
+        self.metrics = Metrics()
+        self.pools = Pools(self.loop, metrics=self.metrics)
+        self.scheduler = Scheduler(self.loop, metrics=self.metrics)
+        self.http_cache = HttpCache()
+        self._inflight = {}
+
+        self.snipes = SnipeStore()
+        self.recent_images = RecentImages()
+        self.emoji_index = GuildEmojiIndex()
+        self.paginators = PaginatorRegistry()
         self.seen_messages = 0
-        self.command_usage = defaultdict(int)
 
         self.loading_emotes = [
             "a:katbotloadspin:521005026349547523",
@@ -115,6 +123,15 @@ class KatBOT(commands.Bot):
 
         print("Done loading cogs!\n-------\n")
 
+    def add_command(self, command):
+        super().add_command(command)
+        self.commands_version += 1
+
+    def remove_command(self, name):
+        command = super().remove_command(name)
+        self.commands_version += 1
+        return command
+
     def _get_prefix(self, bot, message):
         if not message.guild:
             return BOT_PREFIX
@@ -136,6 +153,12 @@ class KatBOT(commands.Bot):
 
         await self.process_commands(message)
 
+    async def on_raw_reaction_add(self, payload):
+        self.paginators.dispatch(payload)
+
+    async def on_raw_reaction_remove(self, payload):
+        self.paginators.dispatch(payload)
+
     async def on_ready(self):
         if not hasattr(self, "connection_time"):
             self.connection_time = time.time() - self.connection_start
@@ -164,12 +187,19 @@ class KatBOT(commands.Bot):
 
         print("The bot is ready!\n")
 
+    async def on_connect(self):
+        # The shared connector could have been closed with discord.py's session
+        if self.session.closed:
+            await self.create_session()
+
     async def start(self, *args, **kwargs):
         await self.create_session()
+        await self.pools.start()
         await super().start(*args, **kwargs)
 
     async def close(self):
         await self.session.close()
+        self.pools.shutdown()
         await super().close()
 
     async def create_session(self):
@@ -178,44 +208,124 @@ class KatBOT(commands.Bot):
         """
         if isinstance(self.session, aiohttp.ClientSession):
             await self.session.close()
+
+        connector = self.connections.get_connector()
+        # discord.py uses it when it recreates its session
+        self.http.connector = connector
         self.session = aiohttp.ClientSession(
             loop=self.loop,
             cookie_jar=aiohttp.DummyCookieJar(
                 loop=self.loop
             ),
-            connector=aiohttp.TCPConnector(
-                resolver=Resolver(),
-                family=socket.AF_INET,
-                loop=self.loop
-            )
+            connector=connector,
+            # discord.py closes it
+            connector_owner=False,
+            trace_configs=self.connections.trace_configs
         )
 
-    async def sget(self, url, *, buffer=False, json=None, timeout=2, max_size=3*(10**6), trust_host=False):
+    async def sget(self, url, *, buffer=False, json=None, view=False, timeout=2, max_size=3*(10**6), max_pixels=None,
+                   cache=True):
         """
         An async function that simplifies the logic of a get method
+
+        Responses are cached following their headers, and identical
+        downloads running at the same time share the same request.
+        Downloads are streamed and stop as soon as they get bigger than
+        `max_size`. If `max_pixels` is given, images with more pixels
+        are refused (as soon as their header is received).
+        `view` returns a (read-only, zero-copy) memoryview instead of bytes.
+        `cache=False` is for the urls giving another response each time (random
+        images apis...): they get neither cached nor shared.
         """
+        stats = self.http_cache.stats[self.http_cache.host(url)]
+
+        entry = self.http_cache.get(url) if cache else None
+        if not cache:
+            data = await self._sget_fetch(url, None, timeout, max_size, max_pixels, store=False)
+        elif entry is not None and entry.fresh:
+            stats.hits += 1
+            data = entry.body
+            if max_pixels:
+                check_image_size(data, max_pixels)
+        else:
+            key = (url, max_size, max_pixels)
+            task = self._inflight.get(key)
+            if task is None:
+                task = self.loop.create_task(self._sget_fetch(url, entry, timeout, max_size, max_pixels))
+                self._inflight[key] = task
+                task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            else:
+                stats.coalesced += 1
+            # shielded, so that one caller giving up doesn't cancel it for the others
+            data = await asyncio.shield(task)
+
+        if len(data) > max_size:
+            raise SgetError("Tentative de téléchargement d'un fichier trop gros.")
+
+        if json:
+            return json_loads(data)[json]
+        elif buffer:
+            return io.BytesIO(data)
+        elif view:
+            return memoryview(data)
+        else:
+            return data
+
+    async def sget_many(self, urls, *, budget=5, progress=None, **kwargs):
+        """
+        Downloads several urls at the same time (see `sget` for the kwargs, its
+        `timeout` is per download), all of them within a shared time `budget`.
+
+        `progress` is awaited with (done, total) after each download.
+        Returns the results in the order of `urls`.
+        """
+        tasks = [self.loop.create_task(self.sget(url, **kwargs)) for url in urls]
+        done = 0
+        try:
+            async with Timeout(budget, loop=self.loop):
+                for fut in asyncio.as_completed(tasks):
+                    await fut
+                    done += 1
+                    if progress:
+                        await progress(done, len(tasks))
+        except asyncio.TimeoutError as e:
+            raise SgetError("Le téléchargement à pris trop de temps.") from e
+        finally:
+            # If one of them failed, the others are useless
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()
+
+        return [task.result() for task in tasks]
+
+    async def _sget_fetch(self, url, entry, timeout, max_size, max_pixels, store=True):
+        stats = self.http_cache.stats[self.http_cache.host(url)]
+        stats.requests += 1
+        headers = entry.validators if entry is not None else {}
+
         try:
             async with Timeout(timeout, loop=self.loop):
-                async with self.session.get(url) as r:
-                    try:
-                        if int(r.headers["Content-Length"]) > max_size:
-                            raise SgetError(f"Tentative de téléchargement d'un fichier trop gros.")
-                    except KeyError:
-                        # Sometimes, Content-Lenght header will be missing.
-                        # If we trust the host, we can ignore the max_size...
-                        if not trust_host:
-                            raise SgetError("Taille du fichier à téléchargement inconue.")
+                async with self.session.get(url, headers=headers) as r:
+                    if r.status == 304 and entry is not None:
+                        stats.revalidated += 1
+                        self.http_cache.refresh(url, entry, r.headers)
+                        if max_pixels:
+                            check_image_size(entry.body, max_pixels)
+                        return entry.body
 
                     if r.status == 200:
-                        if json:
-                            j = await r.json()
-                            return j[json]
-
-                        elif buffer:
-                            data = await r.read()
-                            return io.BytesIO(data)
-                        else:
-                            return await r.read()
+                        data = await read_limited(
+                            r.content,
+                            max_size,
+                            length=r.content_length,
+                            max_pixels=max_pixels
+                        )
+                        stats.bytes += len(data)
+                        if store:
+                            self.http_cache.store(url, data, r.headers)
+                        return data
                     else:
                         raise SgetError(f"Le téléchargement n'a pas abouti (status HTTP: {r.status}).")
         except asyncio.TimeoutError as e:
@@ -237,19 +347,14 @@ class KatBOT(commands.Bot):
         return None
 
     async def in_thread(self, func, *args, **kwargs):
-        thread = kwargs.pop("thread", True)
-        if thread:
-            Pool = concurrent.futures.ThreadPoolExecutor
-        else:
-            Pool = concurrent.futures.ProcessPoolExecutor
-        with Pool() as p:
-            res = await self.loop.run_in_executor(
-                p,
-                func,
-                *args,
-                **kwargs
-            )
-        return res
+        """
+        Runs a blocking function in one of the bot's pools.
+        Pass `_thread=True/False` to force the pool, else functions marked as
+        `cpu_bound` go to the process pool. The `cancellable` ones are stopped
+        after `_timeout` seconds, or when this gets cancelled.
+        The other kwargs are for `func`.
+        """
+        return await self.pools.run(func, *args, **kwargs)
 
     def new_task(self, coro):
         return self.loop.create_task(coro)
@@ -58,7 +58,7 @@ class Apis(commands.Cog):
     async def chat(self, ctx):
         """Poste une image aleatoire de chat!"""
         await ctx.trigger_typing()
-        url = await self.bot.sget("http://aws.random.cat/meow", json="file")
+        url = await self.bot.sget("http://aws.random.cat/meow", json="file", cache=False)
 
         embed = discord.Embed(color=EMBED_COLOUR)
         embed.add_field(name="Miaou! \U0001f63b", value="\uFEFF")
@@ -75,7 +75,7 @@ class Apis(commands.Cog):
         """Poste une image aleatoire de chien!"""
         await ctx.trigger_typing()
         await ctx.trigger_typing()
-        url = await self.bot.sget("https://random.dog/woof.json", json="url")
+        url = await self.bot.sget("https://random.dog/woof.json", json="url", cache=False)
 
         embed = discord.Embed(color=EMBED_COLOUR)
         embed.add_field(name="Waf! \U0001f436", value="\uFEFF")
@@ -91,7 +91,7 @@ class Apis(commands.Cog):
     async def renard(self, ctx):
         """Poste une image aleatoire de renard!"""
         await ctx.trigger_typing()
-        url = await self.bot.sget("https://randomfox.ca/floof", json="image", trust_host=True)
+        url = await self.bot.sget("https://randomfox.ca/floof", json="image", cache=False)
 
         embed = discord.Embed(color=EMBED_COLOUR)
         embed.add_field(name="Floof! \U0001f98a", value="\uFEFF")
@@ -5,6 +5,9 @@ import discord
 from discord.ext import commands
 
 from .utils import convs, ctimestamp, SgetError
+from .utils.imaging import ImageError
+from .utils.pools import JobCancelled
+from .utils.scheduler import SchedulerFull
 
 
 class ErrorHandlers(commands.Cog):
@@ -83,6 +86,9 @@ class ErrorHandlers(commands.Cog):
         elif isinstance(error, SgetError):
             await ctx.send(error)
 
+        elif isinstance(error, (ImageError, SchedulerFull, JobCancelled)):
+            return await ctx.send(error)
+
         elif isinstance(error, convs.MemberConvFail):
             m = error.member
             return await ctx.send(f"*{m}* n'existe pas comme membre de ce serveur...")
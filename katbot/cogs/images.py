@@ -1,10 +1,10 @@
 import asyncio
 import colorsys
-import io
 import math
 import os
 import random
-import time
+import sys
+import traceback
 from io import BytesIO
 
 import discord
@@ -14,8 +14,19 @@ from discord.ext import commands
 from discord.ext.commands.cooldowns import BucketType
 from PIL import Image, ImageDraw
 
+try:
+    from config import RESULT_CACHE_PATH
+except ImportError:
+    RESULT_CACHE_PATH = None
+
 from .utils.convs import GetImg, MemberConv
-from .utils import datapath
+from .utils.assets import TemplateAssets
+from .utils.cache import ResultCache
+from .utils.gif import GifWriter
+from .utils.http import is_immutable
+from .utils.imaging import (Encoded, encode_animation, encode_image, frame_count, frame_spans, image_extension,
+                            iter_frames, open_image)
+from .utils.pools import NEVER, cancellable, cpu_bound
 
 BIG_CHAR_MAP = " .\\'^\",:;Il!i><~+_-?][}{1)(|\\/tfjrxnuvczXYUJCLQ0OZmwqpdbkhao*#MW&8%B@$"
 SMALL_CHAR_MAP = " .:-=+*#%@"
@@ -29,34 +40,55 @@ CHAR_MAPS = (
     BOX_CHAR_MAP
 )
 
+# triant will not output more frames than this
+MAX_SORTING_FRAMES = 50
 
-def lum(rgb):
-    """
-    Returns the luminosity of a pixel
-    """
-    r, g, b = rgb
-    return math.sqrt(.241 * r + .691 * g + .068 * b)
+# Images with more pixels than this are refused as soon as their header is downloaded
+MAX_DOWNLOAD_PIXELS = 4096 * 4096
 
+# Above this, the model of colormap gets downscaled
+COLORMAP_MAX_PIXELS = 512 * 512
 
-def get_pixels(img):
-    pixels = []
-    pos = 0
-    for p in list(img.getdata()):
-        pix = Pixel(p)
-        pix.pos = pos
-        pos += 1
-        pixels.append(pix)
 
-    return pixels
+def ascii_lut(char_map):
+    """
+    Maps every grey level (0-255) to the codepoint of its character
+    """
+    step = 255 / len(char_map)
+    return np.array([ord(char_map[int(v / step) - 1]) for v in range(256)], dtype="<u4")
 
 
-class Pixel:
-    def __init__(self, rgb):
-        self.rgb = rgb
-        self.sorter = lum(rgb)
+ASCII_LUTS = tuple(ascii_lut(cm) for cm in CHAR_MAPS)
 
-        self.pos = None
-        self.new = None
+
+def sorting_steps(npixs, max_frames=MAX_SORTING_FRAMES):
+    """
+    Returns the (rows, columns) shapes the pixels get sorted in, one per frame.
+    There is one per divisor of the number of pixels, sampled down to `max_frames`.
+    """
+    small, large = [], []
+    i = 1
+    while i * i <= npixs:
+        if npixs % i == 0:
+            small.append(i)
+            if i != npixs // i:
+                large.append(npixs // i)
+        i += 1
+    steps = [(npixs // d, d) for d in small + large[::-1]]
+
+    if len(steps) > max_frames:
+        # keep the first and the last step (the image fully sorted)
+        last = len(steps) - 1
+        steps = [steps[round(i * last / (max_frames - 1))] for i in range(max_frames)]
+    return steps
+
+
+def luminance(arr):
+    """
+    Returns the luminosity of every pixel of an RGB array
+    """
+    rgb = arr.reshape((-1, 3)).astype(np.float64)
+    return np.sqrt(.241 * rgb[:, 0] + .691 * rgb[:, 1] + .068 * rgb[:, 2])
 
 
 class Images(commands.Cog):
@@ -66,98 +98,195 @@ class Images(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
+        self.assets = TemplateAssets()
+        self.cache = ResultCache(self.bot.loop, path=RESULT_CACHE_PATH)
+        # when reloaded, the workers must get the new processors
+        self.bot.new_task(self.restart_processes())
+
+    def cog_unload(self):
+        self.assets.close()
+
+    async def restart_processes(self):
+        try:
+            await self.bot.pools.restart_processes()
+        except Exception:
+            print("Failed to restart the process pool.", file=sys.stderr)
+            traceback.print_exc()
+
+    async def process_url(self, load, command, url, func, *args, params=(), frame_func=None):
+        """
+        Downloads an image and runs `func` on it in the pools, unless the result
+        is already cached (by url for the immutable hosts, else by the downloaded content).
 
-    async def get_avatar(self, user):
-        avatar_url = str(user.avatar_url_as(format="png", size=256))
+        `params` are the arguments that change the result, for the cache key.
+        With a `frame_func`, animated images get it run on each of their frames.
+        Returns the result as bytes and the processing time (None when cached).
+        """
+        # the other hosts can serve another file for the same url later
+        url_key = self.cache.make_key(command, params, url) if is_immutable(url) else None
+        if url_key is not None:
+            data = await self.cache.get(url_key, count_miss=False)
+            if data is not None:
+                return data, None
+
+        name = load.ctx.command.qualified_name
+        await load.update("Téléchargement de l'image...")
+        with self.bot.metrics.timed(name, "download"):
+            objet = await self.bot.sget(url, max_pixels=MAX_DOWNLOAD_PIXELS)
+
+        content_key = self.cache.make_key(command, params, objet)
+        data = await self.cache.get(content_key)
+        time_ = None
+        if data is None:
+            await load.update("Traitement...")
+            count = 1
+            if frame_func is not None:
+                count = await self.bot.in_thread(frame_count, objet, _thread=True)
 
-        async with self.bot.session.get(avatar_url) as response:
-            avatar_bytes = await response.read()
+            if count > 1:
+                out, time_ = await self.process_animated(load, objet, count, frame_func, *args)
+            else:
+                async with self.bot.scheduler.slot(load.ctx, func, load):
+                    with self.bot.metrics.timed(name, "process") as timer:
+                        out = await self.bot.in_thread(func, objet, *args)
+                time_ = timer.elapsed
+
+            if isinstance(out, Encoded):
+                self.bot.metrics.observe(name, "encode", out.time)
+                data = out.data
+            elif isinstance(out, BytesIO):
+                data = out.getvalue()
+            else:
+                data = out.encode("utf-8")
+            self.bot.metrics.record_size(name, len(data))
+            await self.cache.put(content_key, data)
+        if url_key is not None:
+            self.cache.alias(url_key, content_key)
+
+        return data, time_
+
+    async def process_animated(self, load, data, count, func, *args):
+        """
+        Runs `func` on the frames of an animated image, split between the
+        workers of the process pool, then encodes them back as a GIF.
+        Returns the result and the processing time.
+        """
+        name = load.ctx.command.qualified_name
+        spans = frame_spans(count)
+        size = math.ceil(len(spans) / self.bot.pools.processes)
+        chunks = [spans[i:i + size] for i in range(0, len(spans), size)]
+
+        await load.update(f"Traitement ({len(spans)} images)...")
+        async with self.bot.scheduler.slot(load.ctx, self.process_frames, load, weight=len(chunks)):
+            with self.bot.metrics.timed(name, "process") as timer:
+                jobs = [
+                    self.bot.loop.create_task(self.bot.in_thread(self.process_frames, data, chunk, func, args))
+                    for chunk in chunks
+                ]
+                try:
+                    parts = await asyncio.gather(*jobs)
+                finally:
+                    # If one of them failed, the others are useless
+                    for job in jobs:
+                        job.cancel()
+
+                frames = [frame for part in parts for frame in part]
+                out = await self.bot.in_thread(encode_animation, [f for f, _ in frames], [d for _, d in frames])
 
-        return avatar_bytes
+        return out, timer.elapsed
 
     @staticmethod
-    def process_nyan(avatar_bytes):
-        with Image.open(BytesIO(avatar_bytes)) as im:
-            locations = [
-                (128, 63),  # Frame 1 position
-                (128, 63),  # etc...
-                (131, 65),
-                (131, 65),
-                (128, 65),
-                (128, 63),
-                (128, 64),
-                (131, 65),
-            ]
-            frames = []
-            fn = 0
-            for loc in locations:
-                fn = fn + 1
-
-                with Image.open(datapath(
-                        "nyan frames",
-                        f"nyan_frame_ ({fn}).jpg")) as support:
-
-                    im = im.resize((40, 40))
-                    try:
-                        support.paste(im, loc, im)
-                    except Exception:
-                        support.paste(im, loc)
-
-                    frames.append(support)
-
-                final_buffer = BytesIO()
-
-                frames[0].save(
-                    final_buffer,
-                    "gif",
-                    save_all=True,
-                    append_images=frames[1:],
-                    duration=100,
-                    loop=0
-                )
+    @cpu_bound
+    @cancellable
+    def process_frames(data, spans, func, args, token=NEVER):
+        """Decodes the frames of `spans` one by one and runs `func` on them."""
+        frames = []
+        for frame, duration in iter_frames(data, spans):
+            token.check()
+            with frame:
+                frames.append((func(frame, *args), duration))
+        return frames
 
-        final_buffer.seek(0)
+    @staticmethod
+    def make_file(data, name):
+        """A file to send for an encoded result, with the extension of its format."""
+        return discord.File(BytesIO(data), f"{name}.{image_extension(data)}")
 
-        return final_buffer
+    @staticmethod
+    def fmt_time(time_):
+        if time_ is None:
+            return "*Depuis le cache:*"
+        return f"*En {round(time_ * 1000, 3)}ms:*"
 
     @staticmethod
-    def process_circle(avatar_bytes: bytes, colour: tuple) -> BytesIO:
-
-        # we must use BytesIO to load the image here as PIL expects a stream instead of
-        # just raw bytes.
-        with Image.open(BytesIO(avatar_bytes)) as im:
-            # this creates a new image the same size as the user's avatar, with the
-            # background colour being the user's colour.
-            with Image.new("RGB", im.size, colour) as background:
-                # this ensures that the user's avatar lacks an alpha channel, as we're
-                # going to be substituting our own here.
-                rgb_avatar = im.convert("RGB")
-                # this is the mask image we will be using to create the circle cutout
-                # effect on the avatar.
-                with Image.new("L", im.size, 0) as mask:
-                    # ImageDraw lets us draw on the image, in this instance, we will be
-                    # using it to draw a white circle on the mask image.
-                    mask_draw = ImageDraw.Draw(mask)
-                    # draw the white circle from 0, 0 to the bottom right corner of the image
-                    mask_draw.ellipse([(0, 0), im.size], fill=255)
-                    # paste the alpha-less avatar on the background using the new circle mask
-                    # we just created.
-                    background.paste(rgb_avatar, (0, 0), mask=mask)
-                # prepare the stream to save this image into
-                final_buffer = BytesIO()
-                # save into the stream, using png format.
-                background.save(final_buffer, "png")
-        # seek back to the start of the stream
+    @cancellable
+    def process_nyan(avatar_bytes, supports, token=NEVER):
+        # NOTE: `supports` are the shared nyan frames, they must not be drawn on
+        locations = [
+            (128, 63),  # Frame 1 position
+            (128, 63),  # etc...
+            (131, 65),
+            (131, 65),
+            (128, 65),
+            (128, 63),
+            (128, 64),
+            (131, 65),
+        ]
+        # twice the final size, for the quality of the resize
+        with open_image(avatar_bytes, mode="RGBA", fit=(80, 80)) as im:
+            im = im.resize((40, 40))
+
+        frames = []
+        for support, loc in zip(supports, locations):
+            token.check()
+            support = support.copy()
+            support.paste(im, loc, im)
+
+            frames.append(support)
+
+        final_buffer = BytesIO()
+        frames[0].save(
+            final_buffer,
+            "gif",
+            save_all=True,
+            append_images=frames[1:],
+            duration=100,
+            loop=0
+        )
         final_buffer.seek(0)
 
         return final_buffer
 
     @staticmethod
-    def process_grab(buff):
-        with Image.open(BytesIO(buff)) as avy:
-            if avy.mode != 'RGBA':
-                avy = avy.convert('RGBA')
+    def circle_frame(im, colour):
+        # this creates a new image the same size as the user's avatar, with the
+        # background colour being the user's colour.
+        background = Image.new("RGB", im.size, colour)
+        # this is the mask image we will be using to create the circle cutout
+        # effect on the avatar.
+        with Image.new("L", im.size, 0) as mask:
+            # ImageDraw lets us draw on the image, in this instance, we will be
+            # using it to draw a white circle on the mask image.
+            mask_draw = ImageDraw.Draw(mask)
+            # draw the white circle from 0, 0 to the bottom right corner of the image
+            mask_draw.ellipse([(0, 0), im.size], fill=255)
+            # paste the alpha-less avatar on the background using the new circle mask
+            # we just created.
+            background.paste(im, (0, 0), mask=mask)
+        return background
+
+    @staticmethod
+    def process_circle(avatar_bytes: bytes, colour: tuple) -> Encoded:
+        # this loads the user's avatar without an alpha channel, as we're
+        # going to be substituting our own here.
+        with open_image(avatar_bytes, mode="RGB") as im:
+            with Images.circle_frame(im, colour) as background:
+                # encode it, it's a photo most of the time, so a lossy format is fine
+                return encode_image(background, lossy=True)
 
+    @staticmethod
+    def process_grab(buff, top):
+        with open_image(buff, mode="RGBA") as avy:
             width, height = avy.size
 
             # Gradient part
@@ -171,17 +300,12 @@ class Images(commands.Cog):
 
             with Image.alpha_composite(avy, black_im) as gradient_im:
 
-                # Pasting part
-                with Image.open(datapath("grab", "grab_top.png")) as top:
+                # Pasting part, on a copy of the shared template
+                with top.copy() as top:
                     gradient_im = gradient_im.resize([175] * 2)
                     top.paste(gradient_im, (218, 0))
 
-                    buff = BytesIO()
-
-                    top.save(buff, "PNG")
-
-        buff.seek(0)
-        return buff
+                    return encode_image(top)
 
     @staticmethod
     def process_random_color(method):
@@ -191,146 +315,106 @@ class Images(commands.Cog):
             values = tuple([random.randint(0, 255) for _ in range(3)])
 
         with Image.new("RGB", (75, 75), values) as img:
-            buff = io.BytesIO()
-            img.save(buff, "png")
-        buff.seek(0)
-        return buff, "#{0:02x}{1:02x}{2:02x}".format(*values)
+            out = encode_image(img)
+        return out, "#{0:02x}{1:02x}{2:02x}".format(*values)
 
     @staticmethod
-    def process_sort(data):
-        with Image.open(BytesIO(data)) as img:
-            # TODO: decide if i should keep this
-            # if img.mode != "RGB":
-            #     img = img.convert("RGB")
-
-            # Convert the image to an array
-            arr = np.array(img)
+    def sort_frame(img):
+        # Convert the image to an array
+        arr = np.array(img)
 
         shape = arr.shape
         # Sort the images pixels
         arr = arr.reshape((shape[0] * shape[1], shape[2]))
         arr.sort(0)
 
-        with Image.fromarray(arr.reshape(shape)) as new:
-            # we can now save the image back
-            buff = BytesIO()
-            new.save(buff, "png")
-
-        buff.seek(0)
-        return buff
+        return Image.fromarray(arr.reshape(shape))
 
     @staticmethod
-    def process_way_sort(data, way):
-        with Image.open(BytesIO(data)) as img:
-            arr = np.array(img)
-
+    def way_sort_frame(img, way):
+        arr = np.array(img)
         arr.sort(way)  # 0: vertical | 1: horizontal
 
-        with Image.fromarray(arr) as new:
-            buff = BytesIO()
-            new.save(buff, "png")
+        return Image.fromarray(arr)
 
-        buff.seek(0)
-        return buff
+    @staticmethod
+    @cpu_bound
+    def process_sort(data):
+        with open_image(data) as img, Images.sort_frame(img) as new:
+            # we can now save the image back
+            return encode_image(new)
 
     @staticmethod
-    def process_sorting(data):
-        # NOTE: hight resolution images will output LARGE files
-        with Image.open(BytesIO(data)) as img:
-            if img.mode != "RGB":
-                img = img.convert("RGB")
-            size = img.width * img.height
-            if size > 65536:
-                img.thumbnail((256, 256))
+    @cpu_bound
+    def process_way_sort(data, way):
+        with open_image(data) as img, Images.way_sort_frame(img, way) as new:
+            return encode_image(new)
 
+    @staticmethod
+    @cpu_bound
+    @cancellable
+    def process_sorting(data, token=NEVER):
+        # NOTE: hight resolution images will output LARGE files
+        with open_image(data, mode="RGB", fit=(256, 256)) as img:
             arr = np.array(img)
+            # Sorting only moves the channel values around, so the
+            # palette of the original image fits every frame well enough
+            palette = img.quantize(256)
         shape = arr.shape
 
-        npixs = shape[0] * shape[1]
-        valid = []
-        for i in range(1, npixs + 1):
-            num = npixs / i
-            if num.is_integer():
-                valid.append((int(num), i))
+        steps = sorting_steps(shape[0] * shape[1])
 
-        frames = []
-        for v in valid:
-            arr = arr.reshape((v[0], v[1], shape[2]))
+        buff = BytesIO()
+        gif = GifWriter(buff, palette)
+        for i, (rows, cols) in enumerate(steps):
+            token.check()
+            arr = arr.reshape((rows, cols, shape[2]))
             arr.sort(1)
 
             with Image.fromarray(arr.reshape(shape)) as new:
-                frames.append(new)
+                # the last frame stays longer
+                gif.add_frame(new, 125 if i < len(steps) - 1 else 750)
+        gif.close()
+        palette.close()
 
-        buff = BytesIO()
-        frames[0].save(
-            buff,
-            "gif",
-            save_all=True,
-            append_images=frames[1:] + frames[-1:] * 5,
-            duration=125,
-            loop=0
-        )
         buff.seek(0)
-        return buff
+        return buff, gif.frames
 
     @staticmethod
-    def process_colormap(in_):
+    @cpu_bound
+    @cancellable
+    def process_colormap(in_, max_pixels=COLORMAP_MAX_PIXELS, token=NEVER):
         # Image model
-        with Image.open(BytesIO(in_[1])) as img_model:
-            if img_model.mode != "RGB":
-                img_model = img_model.convert("RGB")
-
+        with open_image(in_[1], max_pixels, mode="RGB") as img_model:
             width, height = img_model.size
-            model = get_pixels(img_model)
-
-        model.sort(key=lambda pix: pix.sorter)
-
-        # Color source
-        with Image.open(BytesIO(in_[0])) as img_source:
-            if img_source.mode != "RGB":
-                img_source = img_source.convert("RGB")
+            model = np.asarray(img_model).reshape((-1, 3))
 
-            if not img_model.size == img_source.size:
+        # Color source, it gets resized to the size of the model
+        with open_image(in_[0], 4 * width * height, mode="RGB") as img_source:
+            if not img_source.size == (width, height):
                 img_source = img_source.resize((width, height))
-            csource = get_pixels(img_source)
-
-        csource.sort(key=lambda pix: pix.sorter)
-
-        # track the first's image equivalent pixels
-        # to the second image
-        for i, pix in enumerate(csource):
-            model[i].new = pix.rgb
-
-        # sort the second image back by original position
-        model.sort(key=lambda pix: pix.pos)
-        pixels = [pix.new for pix in model]
+            csource = np.asarray(img_source).reshape((-1, 3))
+        token.check()
 
-        with Image.new("RGB", (width, height)) as new:
-            new.putdata(pixels)
+        # both images are sorted by luminosity (stable, like list.sort), the n-th
+        # darkest pixel of the model then takes the colour of the n-th darkest
+        # pixel of the source, at its original position
+        out = np.empty_like(model)
+        out[np.argsort(luminance(model), kind="stable")] = csource[np.argsort(luminance(csource), kind="stable")]
 
-            buff = BytesIO()
-            new.save(buff, "png")
-
-        buff.seek(0)
-        return buff
+        with Image.fromarray(out.reshape((height, width, 3))) as new:
+            return encode_image(new, lossy=True, token=token)
 
     @staticmethod
     def process_ascii(data, cmap, is_big=False):
-        with Image.open(BytesIO(data)) as img:
-            if not is_big:
-                img.thumbnail((44, 44))
-            if img.mode != "L":
-                img = img.convert("L")
+        with open_image(data, mode="L", fit=None if is_big else (44, 44)) as img:
             arr = np.array(img)
 
-        char_map = CHAR_MAPS[cmap]
-        ascii_art = ""
-        for i_row in range(0, arr.shape[0], 2):
-            row = arr[i_row]
-            for col in row:
-                ascii_art += char_map[int(col / (255 / len(char_map))) - 1]
-            ascii_art += "\n"
-        return ascii_art
+        # only one row out of two is kept, as characters are higher than wide
+        codes = ASCII_LUTS[cmap][arr[::2]]
+        # add the line breaks as a last column, then decode everything at once
+        codes = np.concatenate((codes, np.full((codes.shape[0], 1), ord("\n"), dtype="<u4")), axis=1)
+        return codes.tobytes().decode("utf-32-le")
 
     @commands.command()
     @commands.cooldown(1, 15, BucketType.user)
@@ -339,17 +423,10 @@ class Images(commands.Cog):
         objet = objet or str(ctx.author.avatar_url_as(format="png", size=256))
 
         async with ctx.loading() as load:
-            await load.update("Téléchargement de l'image...")
-            objet = await self.bot.sget(objet)
-
-            await load.update("Traitement...")
-            time_ = time.time()
-            buff = await self.bot.in_thread(self.process_nyan, objet)
-            file_ = discord.File(filename="nyan.gif", fp=buff)
-            time_ = time.time() - time_
+            data, time_ = await self.process_url(load, "nyan", objet, self.process_nyan, self.assets.nyan_frames)
 
             await load.update("Envoi...")
-            await ctx.send(f"*En {round(time_ * 1000, 3)}ms:*", file=file_)
+            await ctx.send(self.fmt_time(time_), file=discord.File(BytesIO(data), "nyan.gif"))
 
     @commands.command()
     @commands.cooldown(1, 10, BucketType.user)
@@ -357,7 +434,6 @@ class Images(commands.Cog):
         """Montre l'avatar du membre specifié dans un rond sur sa couleur."""
 
         membre = membre or ctx.author
-        time_ = time.time()
 
         async with ctx.loading() as load:
             if isinstance(membre, discord.Member):
@@ -365,16 +441,14 @@ class Images(commands.Cog):
             else:
                 member_colour = (0, 0, 0)
 
-            await load.update("Téléchargement de l'image...")
-            avatar_bytes = await self.get_avatar(membre)
-
-            await load.update("Traitement...")
-            final_buffer = await self.bot.in_thread(self.process_circle, avatar_bytes, member_colour)
-            file_ = discord.File(filename="cercle.png", fp=final_buffer)
-            time_ = time.time() - time_
+            data, time_ = await self.process_url(
+                load, "cercle", str(membre.avatar_url_as(static_format="png", size=256)),
+                self.process_circle, member_colour,
+                params=member_colour, frame_func=self.circle_frame
+            )
 
             await load.update("Envoi...")
-            await ctx.send(f"*En {round(time_ * 1000, 3)}ms:*", file=file_)
+            await ctx.send(self.fmt_time(time_), file=self.make_file(data, "cercle"))
 
     @commands.command()
     @commands.cooldown(1, 10, BucketType.user)
@@ -383,13 +457,14 @@ class Images(commands.Cog):
 
         async with ctx.loading() as load:
             await load.update("Téléchargement de l'image...")
-            objet = await self.bot.sget(objet)
+            objet = await self.bot.sget(objet, max_pixels=MAX_DOWNLOAD_PIXELS)
 
             await load.update("Traitement...")
-            buff = await self.bot.in_thread(self.process_grab, objet)
+            async with self.bot.scheduler.slot(ctx, self.process_grab, load):
+                out = await self.bot.in_thread(self.process_grab, objet, self.assets.grab_top)
             files = [
-                discord.File(filename="top.png", fp=buff),
-                discord.File(fp=datapath("grab", "grab_bottom.jpg"), filename="down.jpg")
+                self.make_file(out.data, "top"),
+                discord.File(fp=BytesIO(self.assets.grab_bottom), filename="down.jpg")
             ]
             await load.update("Envoi...")
             await ctx.send(files=files)
@@ -400,8 +475,9 @@ class Images(commands.Cog):
         """
         Créé une image avec une couleur aleatoire.
         """
-        buff, code = await self.bot.in_thread(self.process_random_color, "hsv")
-        await ctx.send(code, file=discord.File(buff, "random.png"))
+        async with self.bot.scheduler.slot(ctx, self.process_random_color):
+            out, code = await self.bot.in_thread(self.process_random_color, "hsv")
+        await ctx.send(code, file=self.make_file(out.data, "random"))
 
     @commands.command(aliases=["couleur_aleatoire2", "coulat2", "randc2", "ca2", "rc2"])
     @commands.cooldown(1, 2, BucketType.user)
@@ -409,8 +485,9 @@ class Images(commands.Cog):
         """
         Créé une image avec une couleur aleatoire en utilisant une autre methode.
         """
-        buff, code = await self.bot.in_thread(self.process_random_color, "hex")
-        await ctx.send(code, file=discord.File(buff, "random.png"))
+        async with self.bot.scheduler.slot(ctx, self.process_random_color):
+            out, code = await self.bot.in_thread(self.process_random_color, "hex")
+        await ctx.send(code, file=self.make_file(out.data, "random"))
 
     @commands.group(aliases=["sort"], invoke_without_command=True)
     @commands.cooldown(1, 10, BucketType.user)
@@ -418,19 +495,13 @@ class Images(commands.Cog):
         """
         Trie les pixels d'une image.
         """
-        objet = objet or str(ctx.author.avatar_url_as(format="png", size=256))
+        objet = objet or str(ctx.author.avatar_url_as(static_format="png", size=256))
 
         async with ctx.loading() as load:
-            await load.update("Téléchargement de l'image...")
-            objet = await self.bot.sget(objet)
-
-            await load.update("Traitement...")
-            time_ = time.perf_counter()
-            buff = await self.bot.in_thread(self.process_sort, objet)
-            time_ = time.perf_counter() - time_
+            data, time_ = await self.process_url(load, "trie", objet, self.process_sort, frame_func=self.sort_frame)
 
             await load.update("Envoi...")
-            await ctx.send(f"*En {round(time_ * 1000, 3)}ms:*", file=discord.File(buff, "sorted.png"))
+            await ctx.send(self.fmt_time(time_), file=self.make_file(data, "sorted"))
 
     @trie.command(name="vertical", aliases=["v"])
     @commands.cooldown(1, 10, BucketType.user)
@@ -438,19 +509,16 @@ class Images(commands.Cog):
         """
         Trie les pixels d'une image verticalement.
         """
-        objet = objet or str(ctx.author.avatar_url_as(format="png", size=256))
+        objet = objet or str(ctx.author.avatar_url_as(static_format="png", size=256))
 
         async with ctx.loading() as load:
-            await load.update("Téléchargement de l'image...")
-            objet = await self.bot.sget(objet)
-
-            await load.update("Traitement...")
-            time_ = time.perf_counter()
-            buff = await self.bot.in_thread(self.process_way_sort, objet, 0)
-            time_ = time.perf_counter() - time_
+            data, time_ = await self.process_url(
+                load, "trie", objet, self.process_way_sort, 0,
+                params=0, frame_func=self.way_sort_frame
+            )
 
             await load.update("Envoi...")
-            await ctx.send(f"*En {round(time_ * 1000, 3)}ms:*", file=discord.File(buff, "sorted.png"))
+            await ctx.send(self.fmt_time(time_), file=self.make_file(data, "sorted"))
 
     @trie.command(name="horizontal", aliases=["h"])
     @commands.cooldown(1, 10, BucketType.user)
@@ -458,19 +526,16 @@ class Images(commands.Cog):
         """
         Trie les pixels d'une image horizontalement.
         """
-        objet = objet or str(ctx.author.avatar_url_as(format="png", size=256))
+        objet = objet or str(ctx.author.avatar_url_as(static_format="png", size=256))
 
         async with ctx.loading() as load:
-            await load.update("Téléchargement de l'image...")
-            objet = await self.bot.sget(objet)
-
-            await load.update("Traitement...")
-            time_ = time.perf_counter()
-            buff = await self.bot.in_thread(self.process_way_sort, objet, 1)
-            time_ = time.perf_counter() - time_
+            data, time_ = await self.process_url(
+                load, "trie", objet, self.process_way_sort, 1,
+                params=1, frame_func=self.way_sort_frame
+            )
 
             await load.update("Envoi...")
-            await ctx.send(f"*En {round(time_ * 1000, 3)}ms:*", file=discord.File(buff, "sorted.png"))
+            await ctx.send(self.fmt_time(time_), file=self.make_file(data, "sorted"))
 
     @commands.command(aliases=["sorting"])
     @commands.cooldown(1, 20, BucketType.channel)
@@ -480,17 +545,25 @@ class Images(commands.Cog):
         """
         objet = objet or str(ctx.author.avatar_url_as(format="png", size=256))
 
+        name = ctx.command.qualified_name
         async with ctx.loading() as load:
             await load.update("Téléchargement de l'image...")
-            objet = await self.bot.sget(objet)
+            with self.bot.metrics.timed(name, "download"):
+                objet = await self.bot.sget(objet, max_pixels=MAX_DOWNLOAD_PIXELS)
 
             await load.update("Traitement...")
-            time_ = time.perf_counter()
-            buff = await self.bot.in_thread(self.process_sorting, objet, thread=True)
-            time_ = time.perf_counter() - time_
+            async with self.bot.scheduler.slot(ctx, self.process_sorting, load):
+                with self.bot.metrics.timed(name, "process") as timer:
+                    buff, frames = await self.bot.in_thread(self.process_sorting, objet)
+
+            self.bot.metrics.record_size(name, buff.getbuffer().nbytes)
 
             await load.update("Envoi...")
-            await ctx.send(f"*En {round(time_, 3)}s:*", file=discord.File(buff, "sorting.gif"))
+            size = buff.getbuffer().nbytes / 1000
+            await ctx.send(
+                f"*En {round(timer.elapsed, 3)}s ({frames} images, {size:.1f}Ko):*",
+                file=discord.File(buff, "sorting.gif")
+            )
 
     @commands.command(aliases=["colormap"])
     @commands.cooldown(1, 15, commands.BucketType.user)
@@ -500,32 +573,34 @@ class Images(commands.Cog):
         model = model or str(self.bot.user.avatar_url_as(format="png", size=256))
 
         async with ctx.loading() as load:
-            await load.update("Téléchargement des images (1/2)...")
-            in_ = []
-            in_.append(await self.bot.sget(source))
+            async def progress(done, total):
+                await load.update(f"Téléchargement des images ({done}/{total})...")
 
-            await load.update("Téléchargement des images (2/2)...")
-            in_.append(await self.bot.sget(model))
+            name = ctx.command.qualified_name
+            await progress(0, 2)
+            with self.bot.metrics.timed(name, "download"):
+                in_ = await self.bot.sget_many([source, model], progress=progress, max_pixels=MAX_DOWNLOAD_PIXELS)
 
             await load.update("Traitement...")
-            time_ = time.perf_counter()
-            buff = await self.bot.in_thread(self.process_colormap, in_)
-            time_ = time.perf_counter() - time_
+            async with self.bot.scheduler.slot(ctx, self.process_colormap, load):
+                with self.bot.metrics.timed(name, "process") as timer:
+                    out = await self.bot.in_thread(self.process_colormap, in_)
+            self.bot.metrics.observe(name, "encode", out.time)
+            self.bot.metrics.record_size(name, len(out.data))
 
             await load.update("Envoi...")
-            await ctx.send(f"*En {round(time_, 3)}s:*", file=discord.File(buff, "colormap.png"))
+            await ctx.send(f"*En {round(timer.elapsed, 3)}s:*", file=self.make_file(out.data, "colormap"))
 
     async def do_ascii_cmd(self, ctx, objet, cmap, *, is_big=False):
         objet = objet or str(ctx.author.avatar_url_as(format="png", size=256))
 
         async with ctx.loading() as load:
-            await load.update("Téléchargement de l'image...")
-            objet = await self.bot.sget(objet)
-
-            await load.update("Traitement...")
-            time_ = time.perf_counter()
-            out = await self.bot.in_thread(self.process_ascii, objet, cmap, is_big)
-            time_ = time.perf_counter() - time_
+            data, time_ = await self.process_url(
+                load, "ascii", objet,
+                self.process_ascii, cmap, is_big,
+                params=(cmap, is_big)
+            )
+            out = data.decode("utf-8")
 
             if is_big:
                 await load.update("Envoi...")
@@ -542,9 +617,9 @@ class Images(commands.Cog):
                     # Failed..., so we try the others
                     bin_url = await self.bot.safe_bin_post(out)
 
-                await ctx.send(f"*En {round(time_ * 1000, 3)}ms:*\n{bin_url}")
+                await ctx.send(f"{self.fmt_time(time_)}\n{bin_url}")
             else:
-                await ctx.send(f"*En {round(time_ * 1000, 3)}ms:*")
+                await ctx.send(self.fmt_time(time_))
                 await ctx.send(f"```\n{out}\n```")
 
     @commands.group(name="ascii", invoke_without_command=True)
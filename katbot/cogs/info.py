@@ -8,7 +8,31 @@ from discord.ext import commands
 
 from .utils import EMBED_COLOUR, gettime
 from .utils.asyncshell import get_temp, get_linecount
-from .utils.paginator import HelpPaginator
+from .utils.paginator import HelpPaginator, help_field
+
+
+def category(command):
+    return command.cog_name or '\u200bSans catégorie'
+
+
+class HelpCatalog:
+    """
+    The commands shown in the help of the bot, sorted and grouped once
+    with their fields rendered. Only the checks are left to do for each help.
+    """
+
+    def __init__(self, bot):
+        self.version = bot.commands_version
+        self.commands = sorted((c for c in bot.commands if not c.hidden), key=lambda c: (category(c), c.name))
+        self.fields = {c: help_field(c) for c in self.commands}
+
+        self.descriptions = {}
+        for command in self.commands:
+            cog = category(command)
+            if cog not in self.descriptions:
+                actual_cog = bot.get_cog(cog)
+                # get the description if it exists (and the cog is valid) or return Empty embed.
+                self.descriptions[cog] = (actual_cog and actual_cog.description) or discord.Embed.Empty
 
 
 class PaginatedHelpCommand(commands.HelpCommand):
@@ -31,30 +55,28 @@ class PaginatedHelpCommand(commands.HelpCommand):
             alias = command.name if not parent else f'{parent} {command.name}'
         return f'{alias} {command.signature}'
 
-    async def send_bot_help(self, mapping):
-        def key(c):
-            return c.cog_name or '\u200bSans catégorie'
-
+    def get_catalog(self):
         bot = self.context.bot
-        entries = await self.filter_commands(bot.commands, sort=True, key=key)
+        catalog = self.cog.help_catalog
+        if catalog is None or catalog.version != bot.commands_version:
+            catalog = self.cog.help_catalog = HelpCatalog(bot)
+        return catalog
+
+    async def send_bot_help(self, mapping):
+        catalog = self.get_catalog()
+        # already sorted
+        entries = await self.filter_commands(catalog.commands)
         nested_pages = []
         per_page = 9
-        total = 0
-
-        for cog, commands_ in itertools.groupby(entries, key=key):
-            commands_ = sorted(commands_, key=lambda c: c.name)
-            if len(commands_) == 0:
-                continue
-
-            total += len(commands_)
-            actual_cog = bot.get_cog(cog)
-            # get the description if it exists (and the cog is valid) or return Empty embed.
-            description = (actual_cog and actual_cog.description) or discord.Embed.Empty
-            nested_pages.extend((cog, description, commands_[i:i + per_page])
+
+        for cog, commands_ in itertools.groupby(entries, key=category):
+            commands_ = list(commands_)
+            nested_pages.extend((cog, catalog.descriptions[cog], commands_[i:i + per_page])
                                 for i in range(0, len(commands_), per_page))
+        total = len(entries)
 
         # a value of 1 forces the pagination session
-        pages = HelpPaginator(self, self.context, nested_pages, per_page=1)
+        pages = HelpPaginator(self, self.context, nested_pages, per_page=1, fields=catalog.fields)
 
         # swap the get_page implementation to work with our nested pages.
         pages.get_page = pages.get_bot_page
@@ -110,6 +132,7 @@ class Infos(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
+        self.help_catalog = None  # built by the first help
         self.old_help_command = self.bot.help_command
         bot.help_command = PaginatedHelpCommand()
         bot.help_command.cog = self
@@ -196,7 +219,7 @@ class Infos(commands.Cog):
                 round(mem.used / (1024 * 1024), 1),
                 round(mem.percent, 1)
             )
-            cmds = sum([self.bot.command_usage[u] for u in self.bot.command_usage])
+            cmds = self.bot.metrics.total_invocations
             # The actual embed
             embed = discord.Embed(
                 color=EMBED_COLOUR,
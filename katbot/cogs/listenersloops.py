@@ -9,20 +9,38 @@ from discord.ext import commands, tasks
 
 from config import STATUS
 
-from .utils import EMBED_COLOUR, ctimestamp, gettime
+try:
+    from config import METRICS_PATH
+except ImportError:
+    METRICS_PATH = None
+try:
+    from config import AUDIT_LOG_PATH
+except ImportError:
+    AUDIT_LOG_PATH = None
+
+from .utils import ctimestamp, gettime
+from .utils.audit import AuditSink
+from .utils.metrics import write_file
 
 
 class ListenersLoops(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
+        self.audit = AuditSink(path=AUDIT_LOG_PATH)
 
         self.do_report.start()  # pylint: disable=no-member
         self.change_presence.start()  # pylint: disable=no-member
+        if METRICS_PATH:
+            self.dump_metrics.start()  # pylint: disable=no-member
+        self.flush_audit.start()  # pylint: disable=no-member
 
     def cog_unload(self):
         self.change_presence.cancel()  # pylint: disable=no-member
         self.do_report.cancel()  # pylint: disable=no-member
+        self.dump_metrics.cancel()  # pylint: disable=no-member
+        # stopped and not cancelled, to send what is left
+        self.flush_audit.stop()  # pylint: disable=no-member
 
     def adjust_val(self, val, index):
         if not self.last_usage:
@@ -40,48 +58,70 @@ class ListenersLoops(commands.Cog):
 
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
+        self.bot.recent_images.add(message)
+
         if message.author.id == self.bot.user.id:
             return
 
         if isinstance(message.channel, discord.DMChannel):
-            ch = self.bot.get_channel(531519876251123743)  # dm
-            embed = discord.Embed(color=0x7cdef9, description=str(f"Le {ctimestamp()}"))
-            embed.set_author(name=str(message.author), icon_url=message.author.avatar_url)
-            embed.set_footer(text=message.content)
-            await ch.send(embed=embed)
+            self.audit.log("dm", 531519876251123743, message.author, message.content)  # dm
 
     @commands.Cog.listener()
     async def on_message_delete(self, message):
-        if message.attachments:
-            att = message.attachments[0]
-            if not att.width:
-                att = None
-        else:
-            att = None
-        self.bot.snipe_data[message.channel.id] = {
-            "content": message.content,
-            "image": att,
-            "author": message.author,
-            "timestamp": datetime.utcnow()
-        }
+        self.bot.snipes.add(message)
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload):
+        self.bot.recent_images.remove(payload.channel_id, payload.message_id)
+        # nobody will see the result
+        self.bot.scheduler.cancel(payload.message_id)
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload):
+        self.bot.recent_images.remove(payload.channel_id, *payload.message_ids)
+        for message_id in payload.message_ids:
+            self.bot.scheduler.cancel(message_id)
 
     @commands.Cog.listener()
     async def on_message_edit(self, before, after):
+        self.bot.recent_images.update(after)
+
         if before.content != after.content:
             await self.bot.process_commands(after)
 
+    # Keeping the emoji index up to date
+    @commands.Cog.listener()
+    async def on_ready(self):
+        self.bot.emoji_index.rebuild(self.bot.guilds)
+
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild):
+        self.bot.emoji_index.set_guild(guild.id, guild.emojis)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.bot.emoji_index.remove_guild(guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_emojis_update(self, guild, before, after):
+        self.bot.emoji_index.set_guild(guild.id, after)
+
     @commands.Cog.listener()
     async def on_command(self, ctx):
-        self.bot.command_usage[ctx.command.qualified_name] += 1
+        self.bot.metrics.command_started(ctx)
 
-        ch = self.bot.get_channel(534060327395131394)  # commandes
-        embed = discord.Embed(
-            color=EMBED_COLOUR,
-            description=f"Le {ctimestamp()}\n"
-                        f"Commande **{ctx.command}** utilisé dans **{ctx.guild}**, salon **{ctx.channel}**."
+        self.audit.log(
+            "command", 534060327395131394, ctx.author,  # commandes
+            f"Commande **{ctx.command}** utilisé dans **{ctx.guild}**, salon **{ctx.channel}**."
         )
-        embed.set_author(name=str(ctx.message.author), icon_url=ctx.message.author.avatar_url)
-        await ch.send(embed=embed)
+
+    @commands.Cog.listener()
+    async def on_command_completion(self, ctx):
+        self.bot.metrics.command_completed(ctx)
+
+    @commands.Cog.listener()
+    async def on_command_error(self, ctx, error):
+        self.bot.metrics.command_failed(ctx, error)
 
     @commands.Cog.listener()
     async def on_typing(self, channel, user, when):
@@ -146,6 +186,47 @@ class ListenersLoops(commands.Cog):
         await self.bot.wait_until_ready()
         await asyncio.sleep(5)
 
+    @tasks.loop(seconds=5)
+    async def flush_audit(self):
+        await self.send_audit()
+
+    @flush_audit.before_loop
+    async def before_audit(self):
+        await self.bot.wait_until_ready()
+
+    @flush_audit.after_loop
+    async def after_audit(self):
+        await self.send_audit()
+
+    async def send_audit(self):
+        events, dropped = self.audit.drain()
+        if not events:
+            return
+        if self.audit.path:
+            await self.bot.in_thread(self.audit.write, events, _thread=True)
+
+        for channel_id, embed in self.audit.batches(events):
+            ch = self.bot.get_channel(channel_id)
+            if ch is None:
+                continue
+            if dropped:
+                embed.set_footer(text=f"{dropped} évènements perdus (trop nombreux)")
+                dropped = 0
+            try:
+                await ch.send(embed=embed)
+            except discord.HTTPException:
+                pass
+
+    @tasks.loop(minutes=1)
+    async def dump_metrics(self):
+        # rendered here, the metrics only change in the loop
+        text = self.bot.metrics.render()
+        await self.bot.in_thread(write_file, METRICS_PATH, text, _thread=True)
+
+    @dump_metrics.before_loop
+    async def before_metrics(self):
+        await self.bot.wait_until_ready()
+
 
 def setup(bot):
     bot.add_cog(ListenersLoops(bot))
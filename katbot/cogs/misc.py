@@ -1,7 +1,6 @@
 import json
 import random
 import unicodedata
-from difflib import SequenceMatcher
 from urllib.parse import quote_plus
 
 import discord
@@ -9,6 +8,7 @@ from discord.ext import commands
 
 from .utils import EMBED_COLOUR, datapath
 from .utils.convs import GetImg
+from .utils.imaging import image_extension
 from .utils.paginator import Pages
 
 with open(datapath("blagues.json"), "r", encoding="utf=8") as f:
@@ -62,23 +62,13 @@ class Misc(commands.Cog):
     @commands.group(name="emoji", aliases=["e"], invoke_without_command=True)
     async def emoji_(self, ctx, emoji: str):
         """Commandes d'emojis."""
-        em_map = {emoj.name: emoj for emoj in self.bot.emojis}
-
-        try:
-            e = em_map[emoji]
-        except KeyError:
-            pass
-        else:
+        e = self.bot.emoji_index.get(emoji)
+        if e is not None:
             return await ctx.send(str(e))
 
-        em_lst = []
-        for e in em_map:
-            em_lst.append((
-                em_map[e],
-                SequenceMatcher(None, emoji, e).ratio()
-            ))
-
-        em_lst = (sorted(em_lst, key=lambda em: em[1], reverse=True))[:3]
+        em_lst = self.bot.emoji_index.search(emoji, 3)
+        if not em_lst:
+            return await ctx.send(f"Je n'ai pas pu trouver l'émoji *\"{emoji}\"*.")
 
         if em_lst[0][1] > 90.0:
             return await ctx.send(
@@ -102,11 +92,7 @@ class Misc(commands.Cog):
         """
         Montre les emojis que je peux voir.
         """
-        el = []
-        for e in sorted(self.bot.emojis, key=lambda e: e.name):
-            el.append(f"{e} **-** {e.name}")
-
-        p = Pages(ctx=ctx, entries=el)
+        p = Pages(ctx=ctx, entries=self.bot.emoji_index.listing())
         await p.paginate()
 
     @commands.command()
@@ -160,7 +146,8 @@ class Misc(commands.Cog):
             e = GetImg().is_emoji(ctx, emoji)
             if e:
                 img = await self.bot.sget(e, buffer=True)
-                await ctx.send(file=discord.File(img, "emoji.png"))
+                # animated emojis are gifs
+                await ctx.send(file=discord.File(img, f"emoji.{image_extension(img.getvalue())}"))
             else:
                 await ctx.send("Je ne connais pas cet emoji, desolé...")
 
@@ -188,37 +175,39 @@ class Misc(commands.Cog):
 
     # Snipe command
     @commands.command()
-    async def snipe(self, ctx):
-        """Montre le dernier message suprimé de ce salon."""
-        try:
-            data = self.bot.snipe_data[ctx.channel.id]
-        except KeyError:
-            await ctx.send(
+    async def snipe(self, ctx, n: int = 1):
+        """Montre le dernier message suprimé de ce salon (ou celui d'avant, etc)."""
+        records = self.bot.snipes.recent(ctx.channel.id)
+        if not records:
+            return await ctx.send(
                 "Je n'ai pas enregistré de supressions de"
                 "messages pour ce salon."
             )
-        else:
-            embed = discord.Embed(
-                color=EMBED_COLOUR,
-                description=data["content"],
-                timestamp=data["timestamp"]
+        if not 0 < n <= len(records):
+            return await ctx.send(
+                f"Je n'ai enregistré que {len(records)} supression(s) de messages pour ce salon."
             )
-            # We try to update the author's info
-            author = self.bot.get_user(data["author"].id)
-            if not author:
-                author = data["author"]
+
+        data = records[n - 1]
+        embed = discord.Embed(
+            color=EMBED_COLOUR,
+            description=data.content,
+            timestamp=data.timestamp
+        )
+        # We try to update the author's info
+        author = self.bot.get_user(data.author_id)
+        if author:
             embed.set_author(
                 name=str(author),
                 icon_url=author.avatar_url_as(format="png")
             )
-            # Try to get the image if there is (still) one
-            if data["image"]:
-                try:
-                    embed.set_image(url=data["image"].proxy_url)
-                except discord.NotFound:
-                    pass
-            embed.set_footer(text=f"Message suprimé")
-            await ctx.send(embed=embed)
+        else:
+            embed.set_author(name=data.author_name, icon_url=data.author_avatar)
+        # The image if there was one (it might not be there anymore)
+        if data.image:
+            embed.set_image(url=data.image)
+        embed.set_footer(text=f"Message suprimé")
+        await ctx.send(embed=embed)
 
     # Charinfo
     @commands.command(aliases=["ci"])
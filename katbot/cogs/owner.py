@@ -352,6 +352,41 @@ class Owner(commands.Cog):
         except Exception:
             await ctx.tick(False)
 
+    @commands.group(name="perf", hidden=True, invoke_without_command=True)
+    @commands.is_owner()
+    async def perf(self, ctx):
+        await ctx.send_help(ctx.command)
+
+    @perf.command(name="pools", aliases=["executors"])
+    @commands.is_owner()
+    async def perf_pools(self, ctx):
+        """Montre l'état des pools d'execution et de la file d'attente."""
+        await ctx.send(f"```\n{self.bot.pools.fmt_stats()}\nFile: {self.bot.scheduler.fmt()}\n```")
+
+    @perf.command(name="metrics", aliases=["metriques"])
+    @commands.is_owner()
+    async def perf_metrics(self, ctx):
+        """Montre les statistiques des commandes."""
+        pages = TextPages(ctx, self.bot.metrics.fmt(), stop_deletes=True)
+        await pages.paginate()
+
+    @perf.command(name="http")
+    @commands.is_owner()
+    async def perf_http(self, ctx):
+        """Montre les statistiques des téléchargements."""
+        await ctx.send(f"```\n{self.bot.connections.stats.fmt()}\n\n{self.bot.http_cache.fmt_stats()}\n```")
+
+    @perf.command(name="cache")
+    @commands.is_owner()
+    async def perf_cache(self, ctx, vider: bool = False):
+        """Montre l'état du cache des commandes d'images."""
+        cog = self.bot.get_cog("Images")
+        if not cog:
+            return await ctx.tick(False)
+        if vider:
+            cog.cache.clear()
+        await ctx.send(f"```\n{cog.cache.fmt_stats()}\n```")
+
     # Logout command
     @commands.command(aliases=["meur", "die"], hidden=True)
     @commands.is_owner()
@@ -0,0 +1,39 @@
+from PIL import Image
+
+from . import datapath
+
+NYAN_FRAMES = 8
+
+
+def load_image(*path):
+    """
+    Opens and fully decodes an image from the data folder.
+    """
+    with Image.open(datapath(*path)) as img:
+        img.load()
+        return img.copy()
+
+
+class TemplateAssets:
+    """
+    The template images used by the image commands, decoded once.
+
+    The images are shared: hand out copies (`Image.copy`) to anything
+    that is going to draw on them.
+    """
+
+    def __init__(self):
+        self.nyan_frames = tuple(
+            load_image("nyan frames", f"nyan_frame_ ({fn}).jpg")
+            for fn in range(1, NYAN_FRAMES + 1)
+        )
+        self.grab_top = load_image("grab", "grab_top.png")
+
+        # Sent as is, no need to decode it
+        with open(datapath("grab", "grab_bottom.jpg"), "rb") as f:
+            self.grab_bottom = f.read()
+
+    def close(self):
+        for img in self.nyan_frames:
+            img.close()
+        self.grab_top.close()
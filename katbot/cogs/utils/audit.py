@@ -0,0 +1,93 @@
+import json
+from collections import deque
+from datetime import datetime
+
+import discord
+
+from . import EMBED_COLOUR, ctimestamp
+
+# Limits of discord for an embed
+MAX_FIELDS = 25
+MAX_FIELD_VALUE = 1024
+MAX_EMBED_SIZE = 5500  # 6000, with some margin for the footer
+
+
+class AuditEvent:
+    __slots__ = ("kind", "channel_id", "timestamp", "when", "author", "author_id", "text")
+
+    def __init__(self, kind, channel_id, author, text):
+        self.kind = kind
+        self.channel_id = channel_id
+        self.timestamp = datetime.utcnow()
+        self.when = ctimestamp()
+        self.author = str(author)
+        self.author_id = author.id
+        self.text = text
+
+    def to_json(self):
+        return json.dumps({
+            "kind": self.kind,
+            "timestamp": self.timestamp.isoformat(),
+            "author": self.author,
+            "author_id": self.author_id,
+            "text": self.text
+        }, ensure_ascii=False)
+
+
+class AuditSink:
+    """
+    Buffers the events sent to the log channels, so they get sent in
+    batches (one message per channel, with a field per event) instead
+    of one message each, out of the path of the commands.
+
+    When more than `max_events` are waiting, the oldest are dropped.
+    With a `path`, the events are also appended to it as JSON lines.
+    """
+
+    def __init__(self, *, max_events=500, path=None):
+        self.events = deque(maxlen=max_events)
+        self.path = path
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self.events)
+
+    def log(self, kind, channel_id, author, text):
+        if len(self.events) == self.events.maxlen:
+            self.dropped += 1
+        self.events.append(AuditEvent(kind, channel_id, author, text))
+
+    def drain(self):
+        """Returns the waiting events and how many were dropped, and forgets them."""
+        events = list(self.events)
+        self.events.clear()
+        dropped, self.dropped = self.dropped, 0
+        return events, dropped
+
+    def write(self, events):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(e.to_json() + "\n" for e in events)
+
+    @staticmethod
+    def batches(events):
+        """
+        Yields (channel id, embed) for the events, grouped by channel,
+        in as few embeds as the limits allow.
+        """
+        channels = {}
+        for event in events:
+            channels.setdefault(event.channel_id, []).append(event)
+
+        for channel_id, events in channels.items():
+            embed = discord.Embed(color=EMBED_COLOUR)
+            size = 0
+            for event in events:
+                name = f"{event.author} - Le {event.when}"[:256]
+                value = event.text[:MAX_FIELD_VALUE] or "\u200b"
+                if len(embed.fields) == MAX_FIELDS or size + len(name) + len(value) > MAX_EMBED_SIZE:
+                    yield channel_id, embed
+                    embed = discord.Embed(color=EMBED_COLOUR)
+                    size = 0
+                embed.add_field(name=name, value=value, inline=False)
+                size += len(name) + len(value)
+            yield channel_id, embed
@@ -0,0 +1,169 @@
+import hashlib
+import os
+from collections import OrderedDict
+
+
+class ResultCache:
+    """
+    A LRU cache for the outputs of the image commands.
+
+    Entries are bytes, keyed by `make_key`. The memory tier and the
+    optional disk tier (`path`, which survives restarts) are both bounded
+    by entry count and total size.
+    """
+
+    def __init__(self, loop, *, max_bytes=32 * 1024 * 1024, max_entries=512, path=None):
+        self.loop = loop
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.path = path
+
+        # key: size of the files of the disk tier, least recently used first
+        self._disk = OrderedDict()
+        self.disk_size = 0
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._load_disk()
+
+        self._entries = OrderedDict()
+        # other keys (urls) leading to an entry (content)
+        self._aliases = OrderedDict()
+        self.size = 0
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(command, params, source):
+        """
+        `source` is either the url of the image (immutable for discord's cdn),
+        or the downloaded bytes.
+        """
+        h = hashlib.blake2b(digest_size=20)
+        h.update(f"{command}\0{params!r}\0".encode("utf-8"))
+        if isinstance(source, str):
+            h.update(b"url\0" + source.encode("utf-8"))
+        else:
+            h.update(b"raw\0")
+            h.update(source)
+        return h.hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.path, key)
+
+    def _load_disk(self):
+        files = []
+        for entry in os.scandir(self.path):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, key, size in sorted(files):
+            self._disk[key] = size
+            self.disk_size += size
+        self._remove_disk(self._evict_disk())
+
+    def _evict_disk(self):
+        """Forgets the least recently used files over the limits, returns their keys."""
+        evicted = []
+        while self.disk_size > self.max_bytes or len(self._disk) > self.max_entries:
+            key, size = self._disk.popitem(last=False)
+            self.disk_size -= size
+            evicted.append(key)
+        return evicted
+
+    def _remove_disk(self, keys):
+        for key in keys:
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+
+    def _read_disk(self, key):
+        try:
+            with open(self._disk_path(key), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, key, data, evicted):
+        tmp = self._disk_path(key) + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self._disk_path(key))
+        self._remove_disk(evicted)
+
+    def alias(self, key, target):
+        """
+        Makes `key` lead to the entry of `target`.
+        """
+        self._aliases[key] = target
+        self._aliases.move_to_end(key)
+        while len(self._aliases) > self.max_entries * 4:
+            self._aliases.popitem(last=False)
+
+    async def get(self, key, *, count_miss=True):
+        """
+        `count_miss=False` is for a first probe, followed by another lookup
+        if it misses (which counts), so a request counts once in the stats.
+        """
+        key = self._aliases.get(key, key)
+        try:
+            data = self._entries[key]
+        except KeyError:
+            pass
+        else:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+        if key in self._disk:
+            self._disk.move_to_end(key)
+            data = await self.loop.run_in_executor(None, self._read_disk, key)
+            if data is not None:
+                self.disk_hits += 1
+                self._store(key, data)
+                return data
+
+        if count_miss:
+            self.misses += 1
+        return None
+
+    async def put(self, key, data):
+        self._store(key, data)
+        if self.path and len(data) <= self.max_bytes:
+            self.disk_size += len(data) - self._disk.pop(key, 0)
+            self._disk[key] = len(data)
+            evicted = self._evict_disk()
+            await self.loop.run_in_executor(None, self._write_disk, key, data, evicted)
+
+    def _store(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        self._entries[key] = data
+        self.size += len(data)
+
+        while self.size > self.max_bytes or len(self._entries) > self.max_entries:
+            _, d = self._entries.popitem(last=False)
+            self.size -= len(d)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._aliases.clear()
+        self.size = 0
+
+    def fmt_stats(self):
+        total = self.hits + self.disk_hits + self.misses
+        ratio = (self.hits + self.disk_hits) / total * 100 if total else 0
+        return (
+            f"Entrées: {len(self._entries)}/{self.max_entries} ({self.size / 1e6:.2f}/{self.max_bytes / 1e6:.2f}Mo)\n"
+            f"Hits: {self.hits} (+{self.disk_hits} disque) | Miss: {self.misses} | Ratio: {ratio:.1f}%\n"
+            f"Evictions: {self.evictions} | Disque: {self.path or 'non'}"
+            + (f" ({len(self._disk)} entrées, {self.disk_size / 1e6:.2f}Mo)" if self.path else "")
+        )
@@ -28,6 +28,14 @@ class Ctx(commands.Context):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
+    async def send(self, content=None, **kwargs):
+        if self.command is None or not (kwargs.get("file") or kwargs.get("files")):
+            return await super().send(content, **kwargs)
+
+        # The upload phase of the commands sending files
+        with self.bot.metrics.timed(self.command.qualified_name, "upload"):
+            return await super().send(content, **kwargs)
+
     async def tick(self, state=True):
         if state:
             try:
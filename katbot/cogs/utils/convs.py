@@ -1,14 +1,9 @@
-import json
-
 import discord
 from discord.ext import commands
 
-from . import EMOJI_REGEX, datapath
-
-IMAGE_FORMATS = ('png', 'jpg', 'jpeg', 'webp')
-
-with open(datapath("emojis.json"), "r", encoding="utf=8") as f:
-    EMOJIS = json.load(f)
+from . import EMOJI_REGEX
+from .emojis import EMOJIS
+from .recent import check_extension, find_image
 
 
 class MemberConvFail(commands.BadArgument):
@@ -80,7 +75,7 @@ class GetImg(commands.Converter):
         except UserConvFail:
             pass
         else:
-            return str(user.avatar_url_as(format="png", size=256))
+            return str(user.avatar_url_as(static_format="png", size=256))
 
         # check if item is url
         if item.startswith("<") and item.endswith(">"):
@@ -88,7 +83,7 @@ class GetImg(commands.Converter):
         if item.startswith(
             ("https://cdn.discordapp.com", "https://media.discordapp.net")
         ):
-            url = self.check_extension(item)
+            url = check_extension(item)
             if url:
                 return item
 
@@ -107,61 +102,36 @@ class GetImg(commands.Converter):
             emote_id = int(groups["id"])
             animated = bool(groups["animated"])
 
-            emote = None
-            if not animated:
-                emote = ctx.bot.get_emoji(emote_id)
-
+            emote = ctx.bot.get_emoji(emote_id)
             if emote:
                 return str(emote.url)
-            elif not animated:
-                # If not build the url manualy and do with it
-                return f"https://cdn.discordapp.com/emojis/{emote_id}.png"
+            # If not build the url manualy and do with it
+            return f"https://cdn.discordapp.com/emojis/{emote_id}.{'gif' if animated else 'png'}"
 
         # check if item is standard emoji
-        if item.strip() in EMOJIS:
-            code = "-".join(map(lambda c: f"{ord(c):x}", item))
+        code = EMOJIS.code(item.strip())
+        if code:
             return f"https://bot.mods.nyc/twemoji/{code}.png"
 
         return
 
     async def from_history(self, ctx):
-        # check channel history for attachments
+        # check the message of the command first
+        url = find_image(ctx.message, invoking=True)
+        if url:
+            return url
+
+        # then the images we saw in the channel
+        recent = ctx.bot.recent_images
+        known, url = recent.latest(ctx.channel.id, ctx.message.id)
+        if known:
+            return url
+
+        # never seen this channel, check its history for attachments
         history = await ctx.channel.history(limit=100, before=ctx.message.created_at).flatten()
+        recent.fill(ctx.channel.id, history)
 
-        for m in [ctx.message] + history:
-            # check attachments (files uploaded to discord)
-            for attachment in m.attachments:
-                extension = self.check_extension(attachment.filename)
-                if not extension:
-                    continue
-                return attachment.url
-
-            # check embeds (user posted url / bot posted rich embed)
-            for embed in m.embeds:
-                if embed.image:
-                    extension = self.check_extension(embed.image.proxy_url)
-                    if extension:
-                        return embed.image.proxy_url
-
-                # bot condition because we do not want image from
-                # rich embed thumbnail
-                if not embed.thumbnail or (m.author.bot and embed.type == "rich"):
-                    continue
-
-                # avoid case when image embed was created from url that is
-                # used as argument or flag
-                if m.id == ctx.message.id:
-                    if embed.thumbnail.url in m.content:
-                        continue
-
-                extension = self.check_extension(embed.thumbnail.proxy_url)
-                if not extension:
-                    continue
-
-                return embed.thumbnail.proxy_url
-
-    def check_extension(self, url):
-        extension = url.rpartition('.')[-1].lower()
-        if extension not in IMAGE_FORMATS:
-            return
-        return extension
+        for m in history:
+            url = find_image(m)
+            if url:
+                return url
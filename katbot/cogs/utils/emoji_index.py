@@ -0,0 +1,150 @@
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+
+
+def trigrams(name):
+    name = f"  {name.lower()} "
+    return {name[i:i + 3] for i in range(len(name) - 2)}
+
+
+def sort_key(emoji):
+    return emoji.name, emoji.id
+
+
+class EmojiListing:
+    """
+    A read-only sequence of the sorted emojis, formatted for
+    the paginator only when a page of it is requested.
+    """
+
+    def __init__(self, emojis):
+        self._emojis = emojis
+
+    def __len__(self):
+        return len(self._emojis)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self.fmt(e) for e in self._emojis[item]]
+        return self.fmt(self._emojis[item])
+
+    @staticmethod
+    def fmt(emoji):
+        return f"{emoji} **-** {emoji.name}"
+
+
+class GuildEmojiIndex:
+    """
+    The custom emojis the bot can see, indexed by name and by trigrams
+    of their names, kept up to date with the guild events.
+
+    A listing sorted by name is also maintained (with insertions and
+    deletions, not full sorts).
+    """
+
+    def __init__(self):
+        self._by_guild = {}
+        self._by_name = {}
+        self._trigrams = defaultdict(set)
+
+        # sort_key(emoji) and emoji, at the same positions
+        self._sorted_keys = []
+        self._sorted = []
+        self._listing = None
+
+    def __len__(self):
+        return len(self._sorted)
+
+    def rebuild(self, guilds):
+        self._by_guild.clear()
+        self._by_name.clear()
+        self._trigrams.clear()
+        for guild in guilds:
+            self._add(guild.id, guild.emojis)
+
+        self._sorted = sorted((e for emojis in self._by_guild.values() for e in emojis), key=sort_key)
+        self._sorted_keys = [sort_key(e) for e in self._sorted]
+        self._listing = None
+
+    def set_guild(self, guild_id, emojis):
+        self.remove_guild(guild_id)
+        self._add(guild_id, emojis)
+        for emoji in emojis:
+            key = sort_key(emoji)
+            i = bisect_left(self._sorted_keys, key)
+            self._sorted_keys.insert(i, key)
+            self._sorted.insert(i, emoji)
+        self._listing = None
+
+    def _add(self, guild_id, emojis):
+        self._by_guild[guild_id] = tuple(emojis)
+        for emoji in emojis:
+            same_name = self._by_name.setdefault(emoji.name, [])
+            if not same_name:
+                for trigram in trigrams(emoji.name):
+                    self._trigrams[trigram].add(emoji.name)
+            same_name.append(emoji)
+
+    def remove_guild(self, guild_id):
+        for emoji in self._by_guild.pop(guild_id, ()):
+            i = bisect_left(self._sorted_keys, sort_key(emoji))
+            del self._sorted_keys[i]
+            del self._sorted[i]
+            self._listing = None
+
+            same_name = self._by_name[emoji.name]
+            same_name.remove(emoji)
+            if same_name:
+                continue
+            del self._by_name[emoji.name]
+            for trigram in trigrams(emoji.name):
+                names = self._trigrams[trigram]
+                names.discard(emoji.name)
+                if not names:
+                    del self._trigrams[trigram]
+
+    def listing(self):
+        """
+        Returns the emojis sorted by name, as an `EmojiListing`.
+        It is kept until the emojis change, so it doesn't move under a paginator.
+        """
+        if self._listing is None:
+            self._listing = EmojiListing(tuple(self._sorted))
+        return self._listing
+
+    def get(self, name):
+        same_name = self._by_name.get(name)
+        # the last one seen wins, like a dict built from bot.emojis
+        return same_name[-1] if same_name else None
+
+    def search(self, query, k=3, *, candidates=50):
+        """
+        Returns the `k` emojis with the closest names, with their ratio, best first.
+        Only the names sharing the most trigrams with the query get compared,
+        or if none does (short queries, typos...), the names around it in the listing.
+        """
+        shared = Counter()
+        for trigram in trigrams(query):
+            shared.update(self._trigrams.get(trigram, ()))
+
+        if shared:
+            names = [name for name, _ in shared.most_common(candidates)]
+        else:
+            names = self._names_around(query, candidates)
+
+        ranked = []
+        for name in names:
+            ranked.append((self._by_name[name][-1], SequenceMatcher(None, query, name).ratio()))
+
+        ranked.sort(key=lambda em: em[1], reverse=True)
+        return ranked[:k]
+
+    def _names_around(self, query, count):
+        """The (distinct) names next to where `query` would be in the sorted listing."""
+        i = bisect_left(self._sorted_keys, (query,))
+        names = []
+        for name, _ in self._sorted_keys[max(0, i - count // 2):i + count]:
+            if not names or names[-1] != name:
+                names.append(name)
+        return names[:count]
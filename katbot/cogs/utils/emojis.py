@@ -0,0 +1,76 @@
+import json
+
+from . import datapath
+
+VARIATION_SELECTOR = "\ufe0f"
+SKIN_TONES = frozenset(chr(c) for c in range(0x1f3fb, 0x1f400))
+
+_END = None  # key of the twemoji code, in the nodes of the trie
+
+
+def twemoji_code(emoji):
+    return "-".join(f"{ord(c):x}" for c in emoji)
+
+
+class StandardEmojis:
+    """
+    The standard (unicode) emojis, compiled once.
+
+    Exact matches are a dict lookup (with their twemoji code precomputed),
+    the others go through a codepoint trie in which variation selectors
+    are optional and skin tones can be added after any emoji.
+    """
+
+    def __init__(self, emojis):
+        self.codes = {e: twemoji_code(e) for e in emojis}
+        self.trie = {}
+        for emoji, code in self.codes.items():
+            node = self.trie
+            for c in emoji:
+                if c == VARIATION_SELECTOR:
+                    continue
+                node = node.setdefault(c, {})
+            node.setdefault(_END, code)
+
+    @classmethod
+    def from_file(cls, *path):
+        with open(datapath(*path), "r", encoding="utf=8") as f:
+            return cls(json.load(f))
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __contains__(self, item):
+        return self.code(item) is not None
+
+    def code(self, item):
+        """
+        Returns the twemoji code of an emoji, None if it isn't one.
+        """
+        try:
+            return self.codes[item]
+        except KeyError:
+            pass
+
+        node = self.trie
+        toned = False
+        for c in item:
+            if c == VARIATION_SELECTOR:
+                continue
+            child = node.get(c)
+            if child is None:
+                if c in SKIN_TONES and _END in node:
+                    # a variant of an emoji we know
+                    toned = True
+                    continue
+                return None
+            node = child
+
+        if _END not in node:
+            return None
+        if toned:
+            return twemoji_code(item)
+        return node[_END]
+
+
+EMOJIS = StandardEmojis.from_file("emojis.json")
@@ -0,0 +1,49 @@
+import struct
+
+from PIL import GifImagePlugin, Image
+
+
+class GifWriter:
+    """
+    Writes an animated GIF frame by frame, instead of keeping
+    every frame in memory until the end like `Image.save` does.
+
+    All the frames share the (global) palette of `palette`,
+    a "P" mode image, usually made with `Image.quantize`.
+    """
+
+    def __init__(self, fp, palette, *, loop=0):
+        self.fp = fp
+        self.palette = palette
+        self.size = palette.size
+        self.frames = 0
+        self.bytes = 0
+
+        colours = bytes(palette.getpalette()[:768])
+        colours += b"\0" * (768 - len(colours))
+
+        self._write(
+            b"GIF89a"
+            + struct.pack("<HHBBB", self.size[0], self.size[1], 0xf7, 0, 0)  # global 256 colours table
+            + colours
+            + b"!\xff\x0bNETSCAPE2.0\x03\x01" + struct.pack("<H", loop) + b"\0"
+        )
+
+    def _write(self, data):
+        self.fp.write(data)
+        self.bytes += len(data)
+
+    def add_frame(self, img, duration):
+        """
+        Quantizes a frame with the shared palette and encodes it right away.
+        """
+        if img.size != self.size:
+            raise ValueError("All the frames must have the same size.")
+
+        with img.quantize(palette=self.palette, dither=Image.NONE) as frame:
+            for chunk in GifImagePlugin.getdata(frame, duration=duration):
+                self._write(chunk)
+        self.frames += 1
+
+    def close(self):
+        self._write(b";")
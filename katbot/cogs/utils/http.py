@@ -0,0 +1,310 @@
+import re
+import socket
+import time
+from collections import OrderedDict, defaultdict
+from io import BytesIO
+from urllib.parse import urlsplit
+
+import aiohttp
+from PIL import Image, ImageFile
+
+from . import SgetError
+
+try:
+    import aiodns
+except ImportError:
+    aiodns = False
+
+Resolver = aiohttp.AsyncResolver if aiodns else aiohttp.ThreadedResolver
+
+# Connection pool tuning
+POOL_LIMIT = 100
+POOL_LIMIT_PER_HOST = 10
+KEEPALIVE_TIMEOUT = 60
+DNS_CACHE_TTL = 300
+
+# The files of these hosts never change for a given url (the hash is in it)
+IMMUTABLE_HOSTS = (
+    "cdn.discordapp.com",
+    "media.discordapp.net",
+)
+IMMUTABLE_TTL = 24 * 3600
+
+MAX_AGE_REGEX = re.compile(r"(?:^|,)\s*(?:s-)?max-age\s*=\s*\"?(\d+)")
+
+CHUNK_SIZE = 64 * 1024
+# If we don't know the size of an image after this, we stop looking
+MAX_HEADER_SIZE = 256 * 1024
+
+
+def is_immutable(url):
+    """If the file of this url never changes, see `IMMUTABLE_HOSTS`."""
+    return (urlsplit(url).hostname or "") in IMMUTABLE_HOSTS
+
+
+def too_big():
+    return SgetError("Tentative de téléchargement d'un fichier trop gros.")
+
+
+def too_many_pixels(size):
+    return SgetError(f"L'image est trop grande ({size[0]}x{size[1]}).")
+
+
+def check_image_size(data, max_pixels):
+    """
+    Checks the dimensions of an already downloaded image, only its header gets read.
+    """
+    try:
+        with Image.open(BytesIO(data)) as img:
+            size = img.size
+    except Exception:
+        # Not an image (or one PIL can't read), not our problem here
+        return
+    if size[0] * size[1] > max_pixels:
+        raise too_many_pixels(size)
+
+
+async def read_limited(stream, max_size, *, length=None, max_pixels=None):
+    """
+    Reads an aiohttp stream into a buffer, and aborts as soon as
+    more than `max_size` bytes were received, whatever the headers said.
+
+    If `max_pixels` is given, the image headers get decoded as soon as they
+    arrive, to abort early if the image has too many pixels.
+    """
+    if length is not None and length > max_size:
+        raise too_big()
+
+    # Preallocated if we know the size, it grows with the chunks if not
+    buf = bytearray(length or 0)
+    pos = 0
+    parser = ImageFile.Parser() if max_pixels else None
+
+    async for chunk in stream.iter_chunked(CHUNK_SIZE):
+        end = pos + len(chunk)
+        if end > max_size:
+            raise too_big()
+        buf[pos:end] = chunk
+
+        if parser is not None:
+            try:
+                parser.feed(chunk)
+            except Exception:
+                parser = None
+            else:
+                if parser.image is not None:
+                    if parser.image.width * parser.image.height > max_pixels:
+                        raise too_many_pixels(parser.image.size)
+                    parser = None
+                elif end > MAX_HEADER_SIZE:
+                    parser = None
+        pos = end
+
+    del buf[pos:]
+    # the only copy, bytes can then be shared without any (BytesIO, memoryview, cache...)
+    return bytes(buf)
+
+
+class CachedResponse:
+    __slots__ = ("body", "etag", "last_modified", "expires")
+
+    def __init__(self, body, etag, last_modified, expires):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires = expires
+
+    @property
+    def fresh(self):
+        return time.monotonic() < self.expires
+
+    @property
+    def validators(self):
+        """The headers to revalidate this response with."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HostStats:
+    __slots__ = ("requests", "hits", "revalidated", "coalesced", "bytes")
+
+    def __init__(self):
+        self.requests = 0
+        self.hits = 0
+        self.revalidated = 0
+        self.coalesced = 0
+        self.bytes = 0
+
+    def fmt(self):
+        return (
+            f"requetes: {self.requests} | cache: {self.hits} | 304: {self.revalidated} | "
+            f"fusionées: {self.coalesced} | {self.bytes / 1e6:.2f}Mo"
+        )
+
+
+class HttpCache:
+    """
+    A byte-bounded, in-memory, LRU cache of the bodies downloaded by `KatBOT.sget`.
+
+    Follows Cache-Control (no-store, no-cache, max-age), keeps the ETag and
+    Last-Modified headers for revalidation, and considers the files of
+    `IMMUTABLE_HOSTS` fresh for a day.
+    """
+
+    def __init__(self, *, max_bytes=16 * 1024 * 1024, max_entry=4 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_entry = max_entry
+
+        self._entries = OrderedDict()
+        self.size = 0
+        self.stats = defaultdict(HostStats)
+
+    @staticmethod
+    def host(url):
+        return urlsplit(url).hostname or "?"
+
+    def get(self, url):
+        """
+        Returns the cached response for this url, fresh or not (see `CachedResponse.fresh`).
+        """
+        entry = self._entries.get(url)
+        if entry is not None:
+            self._entries.move_to_end(url)
+        return entry
+
+    def ttl(self, url, headers):
+        """
+        Returns for how long a response can be used without revalidation,
+        None if it must not be stored.
+        """
+        cache_control = headers.get("Cache-Control", "").lower()
+        if "no-store" in cache_control or "private" in cache_control:
+            return None
+        if "no-cache" in cache_control:
+            return 0
+
+        match = MAX_AGE_REGEX.search(cache_control)
+        if match:
+            return int(match.group(1))
+        if is_immutable(url):
+            return IMMUTABLE_TTL
+        return 0
+
+    def store(self, url, body, headers):
+        ttl = self.ttl(url, headers)
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if ttl is None or len(body) > self.max_entry:
+            return
+        if not ttl and not (etag or last_modified):
+            # We could never use it
+            return
+
+        self.remove(url)
+        self._entries[url] = CachedResponse(body, etag, last_modified, time.monotonic() + ttl)
+        self.size += len(body)
+
+        while self.size > self.max_bytes:
+            _, old = self._entries.popitem(last=False)
+            self.size -= len(old.body)
+
+    def refresh(self, url, entry, headers):
+        """
+        Updates the freshness of a response after a 304.
+        """
+        ttl = self.ttl(url, headers)
+        if ttl is None:
+            self.remove(url)
+        else:
+            entry.expires = time.monotonic() + ttl
+
+    def remove(self, url):
+        old = self._entries.pop(url, None)
+        if old is not None:
+            self.size -= len(old.body)
+
+    def fmt_stats(self):
+        fmt = [f"Cache: {len(self._entries)} réponses, {self.size / 1e6:.2f}/{self.max_bytes / 1e6:.2f}Mo"]
+        for host, stats in sorted(self.stats.items(), key=lambda s: s[1].requests, reverse=True):
+            fmt.append(f"{host}:\n  {stats.fmt()}")
+        return "\n".join(fmt)
+
+
+class ConnectionStats:
+    __slots__ = ("requests", "created", "reused", "dns_hits", "dns_misses", "connectors")
+
+    def __init__(self):
+        self.requests = 0
+        self.created = 0
+        self.reused = 0
+        self.dns_hits = 0
+        self.dns_misses = 0
+        self.connectors = 0
+
+    def fmt(self):
+        return (
+            f"Requetes: {self.requests} | connexions créées: {self.created}, réutilisées: {self.reused}\n"
+            f"DNS: {self.dns_hits} hits, {self.dns_misses} miss | connecteurs créés: {self.connectors}"
+        )
+
+
+class Connections:
+    """
+    The connection pool shared by discord.py and `KatBOT.session`, so they also
+    share their keep-alive connections and DNS cache.
+
+    Only the sessions made with `trace_configs` are counted in the stats.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.connector = None
+        self.stats = ConnectionStats()
+
+        self.trace = aiohttp.TraceConfig()
+        self.trace.on_request_start.append(self._on_request_start)
+        self.trace.on_connection_create_end.append(self._on_connection_create)
+        self.trace.on_connection_reuseconn.append(self._on_connection_reuse)
+        self.trace.on_dns_cache_hit.append(self._on_dns_hit)
+        self.trace.on_dns_cache_miss.append(self._on_dns_miss)
+
+    @property
+    def trace_configs(self):
+        return [self.trace]
+
+    def get_connector(self):
+        """
+        Returns the connector, a new one if it was closed (or never made).
+        """
+        if self.connector is None or self.connector.closed:
+            self.connector = aiohttp.TCPConnector(
+                resolver=Resolver(),
+                family=socket.AF_INET,
+                ttl_dns_cache=DNS_CACHE_TTL,
+                limit=POOL_LIMIT,
+                limit_per_host=POOL_LIMIT_PER_HOST,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+                enable_cleanup_closed=True,
+                loop=self.loop
+            )
+            self.stats.connectors += 1
+        return self.connector
+
+    async def _on_request_start(self, session, ctx, params):
+        self.stats.requests += 1
+
+    async def _on_connection_create(self, session, ctx, params):
+        self.stats.created += 1
+
+    async def _on_connection_reuse(self, session, ctx, params):
+        self.stats.reused += 1
+
+    async def _on_dns_hit(self, session, ctx, params):
+        self.stats.dns_hits += 1
+
+    async def _on_dns_miss(self, session, ctx, params):
+        self.stats.dns_misses += 1
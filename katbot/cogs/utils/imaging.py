@@ -0,0 +1,281 @@
+import math
+import time
+from io import BytesIO
+
+from PIL import Image, features
+
+from .gif import GifWriter
+from .pools import NEVER, cancellable
+
+# What the processors decode at most, unless they say otherwise
+DECODE_MAX_PIXELS = 1024 * 1024
+
+# Animated inputs keep at most this many frames, of at most this many pixels
+MAX_FRAMES = 48
+FRAME_MAX_PIXELS = 256 * 256
+# Animations too big to be sent lose half of their frames down to this, then get smaller
+MIN_FRAMES = 12
+# In ms, faster frames get slowed down by the clients anyway
+MIN_FRAME_DURATION = 20
+
+# The biggest file we can upload on discord
+UPLOAD_LIMIT = 8 * 1000 * 1000
+
+# PNGs up to this get the slower, better compression
+PNG_OPTIMIZE_PIXELS = 512 * 512
+WEBP = features.check("webp")
+LOSSY_QUALITIES = (90, 75, 60)
+
+MAGIC_NUMBERS = (
+    (b"\x89PNG", "png"),
+    (b"GIF8", "gif"),
+    (b"\xff\xd8\xff", "jpg"),
+    (b"RIFF", "webp"),
+)
+
+
+class ImageError(Exception):
+    pass
+
+
+def has_alpha(img):
+    return img.mode in ("RGBA", "LA", "PA", "RGBa") or (img.mode == "P" and "transparency" in img.info)
+
+
+def _round_aspect(number, key):
+    return max(min(math.floor(number), math.ceil(number), key=key), 1)
+
+
+def target_size(size, max_pixels=None, fit=None):
+    """
+    Returns the size an image of `size` gets reduced to, to have at most
+    `max_pixels` and fit in the `fit` box. None if it doesn't need to be.
+    """
+    width, height = size
+    pixels_scale = 1.0
+    if max_pixels and width * height > max_pixels:
+        pixels_scale = math.sqrt(max_pixels / (width * height))
+    fit_scale = min(fit[0] / width, fit[1] / height) if fit else 1.0
+    if min(pixels_scale, fit_scale) >= 1.0:
+        return None
+
+    if pixels_scale < fit_scale:
+        return max(1, int(width * pixels_scale)), max(1, int(height * pixels_scale))
+
+    # rounded like `Image.thumbnail` does, to keep the closest aspect ratio
+    x, y = fit
+    aspect = width / height
+    if x / y >= aspect:
+        x = _round_aspect(y * aspect, key=lambda n: abs(aspect - n / y))
+    else:
+        y = _round_aspect(x / aspect, key=lambda n: 0 if n == 0 else abs(aspect - x / n))
+    return x, y
+
+
+def open_image(data, max_pixels=DECODE_MAX_PIXELS, *, mode=None, fit=None):
+    """
+    Decodes an image, reduced to have at most `max_pixels` (and to fit in the
+    `fit` box, like `Image.thumbnail`), and in `mode`: RGB, or RGBA if it has
+    transparency, when not given.
+
+    The size is read from the header before anything gets decoded, and JPEGs
+    get decoded directly at a reduced scale. Use it as a context manager.
+    """
+    img = _open(data)
+    if mode is None:
+        mode = "RGBA" if has_alpha(img) else "RGB"
+
+    try:
+        target = target_size(img.size, max_pixels, fit)
+        if target and img.format == "JPEG":
+            # decodes at 1/2, 1/4 or 1/8 of the size, as long as it is bigger than target
+            img.draft(mode if mode in ("RGB", "L") else "RGB", target)
+        img.load()
+
+        if img.mode in ("P", "1") and img.mode != mode:
+            # a palette can't be resized with a filter, so before
+            img = _convert(img, mode)
+        if target and img.size != target:
+            # like `Image.thumbnail`, but to exactly the size of `target_size`
+            # (the draft changed the size this would be computed from)
+            with img:
+                img = img.resize(target, Image.BICUBIC, reducing_gap=2.0)
+        if img.mode != mode:
+            img = _convert(img, mode)
+    except OSError:
+        img.close()
+        raise ImageError("L'image est corrompue ou incomplète.") from None
+
+    return img
+
+
+def _open(data):
+    try:
+        return Image.open(BytesIO(data))
+    except Image.DecompressionBombError:
+        raise ImageError("L'image est trop grande.") from None
+    except OSError:
+        raise ImageError("Ce fichier n'est pas une image que je peux lire.") from None
+
+
+def _convert(img, mode):
+    with img:
+        return img.convert(mode)
+
+
+def frame_count(data):
+    """The number of frames of an image, 1 if it isn't animated."""
+    if image_extension(data, None) not in ("gif", "webp"):
+        return 1
+    with _open(data) as img:
+        try:
+            return getattr(img, "n_frames", 1)
+        except OSError:
+            raise ImageError("L'image est corrompue ou incomplète.") from None
+
+
+def frame_spans(count, max_frames=MAX_FRAMES):
+    """
+    Returns the (start, stop) of the frames each kept frame stands for,
+    one every few frames when there are more than `max_frames`.
+    """
+    step = math.ceil(count / max_frames)
+    return [(start, min(start + step, count)) for start in range(0, count, step)]
+
+
+def iter_frames(data, spans, max_pixels=FRAME_MAX_PIXELS, *, mode="RGB"):
+    """
+    Decodes the frames of an animated image one after the other, yields the
+    first frame of each span (see `frame_spans`) and its duration: the one
+    of the whole span, in ms.
+    """
+    with _open(data) as img:
+        target = target_size(img.size, max_pixels)
+        try:
+            for start, stop in spans:
+                duration = 0
+                for index in range(start, stop):
+                    img.seek(index)
+                    if index == start:
+                        frame = img.convert(mode)
+                    duration += img.info.get("duration", 100)
+
+                if target:
+                    frame.thumbnail(target)
+                yield frame, max(duration, MIN_FRAME_DURATION)
+        except (OSError, EOFError):
+            raise ImageError("L'image est corrompue ou incomplète.") from None
+
+
+class Encoded:
+    """An encoded result, with the time it took (in the worker)."""
+    __slots__ = ("data", "format", "time")
+
+    def __init__(self, data, format_, time_):
+        self.data = data
+        self.format = format_
+        self.time = time_
+
+
+def image_extension(data, default="png"):
+    """The extension of an encoded image, from its first bytes."""
+    for magic, extension in MAGIC_NUMBERS:
+        if data[:len(magic)] == magic:
+            return extension
+    return default
+
+
+def _save(img, format_, **params):
+    buff = BytesIO()
+    img.save(buff, format_, **params)
+    return buff.getvalue()
+
+
+def _encode_once(img, lossy, quality):
+    if lossy:
+        if WEBP:
+            return _save(img, "webp", quality=quality, method=4), "webp"
+        if img.mode == "RGB":
+            return _save(img, "jpeg", quality=quality, optimize=True), "jpg"
+
+    params = {"optimize": True} if img.width * img.height <= PNG_OPTIMIZE_PIXELS else {}
+    # with few colours, a palette is smaller and exact
+    if img.mode == "RGB" and img.getcolors(256) is not None:
+        with img.convert("P", palette=Image.ADAPTIVE, colors=256) as pal:
+            return _save(pal, "png", **params), "png"
+    return _save(img, "png", **params), "png"
+
+
+def shared_palette(frames, samples=8):
+    """A "P" image, of the size of the frames, with a palette made from some of them."""
+    step = max(1, len(frames) // samples)
+    sampled = frames[::step][:samples]
+    width, height = sampled[0].size
+    with Image.new("RGB", (width * len(sampled), height)) as strip:
+        for i, frame in enumerate(sampled):
+            strip.paste(frame, (i * width, 0))
+        with strip.quantize(256) as quantized:
+            palette = Image.new("P", (width, height))
+            palette.putpalette(quantized.getpalette())
+    return palette
+
+
+@cancellable
+def encode_animation(frames, durations, *, limit=UPLOAD_LIMIT, token=NEVER):
+    """
+    Encodes RGB frames as a GIF. While it is bigger than `limit`, it loses
+    half of its frames (as long as `MIN_FRAMES` are left), then gets smaller.
+    """
+    started = time.perf_counter()
+    while True:
+        with shared_palette(frames) as palette:
+            buff = BytesIO()
+            gif = GifWriter(buff, palette)
+            for frame, duration in zip(frames, durations):
+                token.check()
+                gif.add_frame(frame, duration)
+            gif.close()
+        if gif.bytes <= limit:
+            return Encoded(buff.getvalue(), "gif", time.perf_counter() - started)
+
+        if len(frames) // 2 >= MIN_FRAMES:
+            # every other frame, which lasts as long as both
+            durations = [sum(durations[i:i + 2]) for i in range(0, len(durations), 2)]
+            frames = frames[::2]
+        else:
+            width, height = frames[0].size
+            size = (max(1, width * 3 // 4), max(1, height * 3 // 4))
+            if size == frames[0].size:
+                raise ImageError("Le résultat est trop gros pour être envoyé.")
+            frames = [frame.resize(size, Image.LANCZOS) for frame in frames]
+
+
+def encode_image(img, *, lossy=False, limit=UPLOAD_LIMIT, token=NEVER):
+    """
+    Encodes a result: as a PNG (with a palette when there are few colours),
+    or as WebP (JPEG if unavailable) when `lossy` is fine for this output.
+
+    While it is bigger than `limit`, it gets re-encoded with a lower
+    quality (if lossy), then smaller.
+    """
+    started = time.perf_counter()
+    qualities = LOSSY_QUALITIES if lossy else (None,)
+    current = img
+    try:
+        while True:
+            for quality in qualities:
+                token.check()
+                data, format_ = _encode_once(current, lossy, quality)
+                if len(data) <= limit:
+                    return Encoded(data, format_, time.perf_counter() - started)
+
+            size = (max(1, current.width * 3 // 4), max(1, current.height * 3 // 4))
+            if size == current.size:
+                raise ImageError("Le résultat est trop gros pour être envoyé.")
+            resized = current.resize(size, Image.LANCZOS)
+            if current is not img:
+                current.close()
+            current = resized
+    finally:
+        if current is not img:
+            current.close()
@@ -0,0 +1,223 @@
+import os
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from discord.ext import commands
+
+# Upper bounds of the buckets of the histograms, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# and in bytes, for the sizes of the outputs
+SIZE_BUCKETS = (10e3, 50e3, 100e3, 250e3, 500e3, 1e6, 2e6, 4e6, 8e6)
+
+# "encode" is part of "process" (it's done in the worker),
+# "queue" is the wait for a slot of the scheduler, before "process"
+PHASES = ("total", "download", "queue", "process", "encode", "upload")
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum", "max")
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        # the last one is for what is above the last bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+    def quantile(self, q):
+        """An upper bound of the quantile `q`, from the buckets."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class Timer:
+    __slots__ = ("started", "elapsed")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+
+class _Timed:
+    __slots__ = ("metrics", "command", "phase", "timer")
+
+    def __init__(self, metrics, command, phase):
+        self.metrics = metrics
+        self.command = command
+        self.phase = phase
+
+    def __enter__(self):
+        self.timer = Timer()
+        return self.timer
+
+    def __exit__(self, type_, value, traceback):
+        self.timer.elapsed = time.perf_counter() - self.timer.started
+        self.metrics.observe(self.command, self.phase, self.timer.elapsed)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def prom_labels(**labels):
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+class Metrics:
+    """
+    The telemetry of the commands: their invocations, errors, and latency
+    histograms (the whole command and its download/process/upload phases),
+    plus the time jobs wait in the pools before being run.
+    """
+
+    def __init__(self):
+        self.invocations = defaultdict(int)
+        # (command, error name): count
+        self.errors = defaultdict(int)
+        # command: count of the ones cancelled (their message got deleted)
+        self.cancelled = defaultdict(int)
+        # (command, phase): Histogram
+        self.latency = defaultdict(Histogram)
+        # pool ("thread" or "process"): Histogram
+        self.executor_queue = defaultdict(Histogram)
+        # command: Histogram of the sizes of its outputs
+        self.output_size = defaultdict(lambda: Histogram(SIZE_BUCKETS))
+
+    @property
+    def total_invocations(self):
+        return sum(self.invocations.values())
+
+    # Hooks of the bot events
+    def command_started(self, ctx):
+        self.invocations[ctx.command.qualified_name] += 1
+        ctx.metrics_started = time.perf_counter()
+
+    def command_completed(self, ctx):
+        if getattr(ctx, "job_cancelled", False):
+            # discord.py completes the commands cancelled while running
+            self.cancelled[ctx.command.qualified_name] += 1
+            return
+        started = getattr(ctx, "metrics_started", None)
+        if started is not None:
+            self.observe(ctx.command.qualified_name, "total", time.perf_counter() - started)
+
+    def command_failed(self, ctx, error):
+        if ctx.command is None:
+            return
+        if isinstance(error, commands.CommandInvokeError):
+            error = error.original
+        self.errors[(ctx.command.qualified_name, type(error).__name__)] += 1
+        self.command_completed(ctx)
+
+    def observe(self, command, phase, value):
+        self.latency[(command, phase)].observe(value)
+
+    def timed(self, command, phase):
+        """
+        Context manager timing a phase of a command, it gives a `Timer`
+        (with the `elapsed` time once done).
+        """
+        return _Timed(self, command, phase)
+
+    def observe_queue(self, pool, wait):
+        self.executor_queue[pool].observe(wait)
+
+    def record_size(self, command, size):
+        self.output_size[command].observe(size)
+
+    def fmt(self):
+        if not self.invocations:
+            return "Aucune commande utilisée."
+
+        fmt = [f"{'commande':<20} {'appels':>6} {'err':>4} {'moy':>8} {'p95':>8}  phases (moy)"]
+        for command, count in sorted(self.invocations.items(), key=lambda c: c[1], reverse=True):
+            total = self.latency.get((command, "total"))
+            errors = sum(c for (cmd, _), c in self.errors.items() if cmd == command)
+            mean = f"{total.mean * 1000:.0f}ms" if total else "-"
+            p95 = f"{total.quantile(0.95) * 1000:.0f}ms" if total else "-"
+
+            phases = []
+            for phase in PHASES[1:]:
+                hist = self.latency.get((command, phase))
+                if hist:
+                    phases.append(f"{phase}: {hist.mean * 1000:.0f}ms")
+            if self.cancelled.get(command):
+                phases.append(f"annulées: {self.cancelled[command]}")
+            sizes = self.output_size.get(command)
+            if sizes:
+                phases.append(f"taille: {sizes.mean / 1000:.0f}Ko")
+            fmt.append(f"{command:<20} {count:>6} {errors:>4} {mean:>8} {p95:>8}  {', '.join(phases)}")
+
+        for pool, hist in sorted(self.executor_queue.items()):
+            fmt.append(
+                f"\nAttente ({pool}): moy {hist.mean * 1000:.1f}ms, "
+                f"p95 {hist.quantile(0.95) * 1000:.1f}ms, max {hist.max * 1000:.1f}ms"
+            )
+        return "\n".join(fmt)
+
+    def render(self):
+        """The metrics in the Prometheus text format."""
+        lines = ["# TYPE katbot_commands_total counter"]
+        for command, count in self.invocations.items():
+            lines.append(f"katbot_commands_total{prom_labels(command=command)} {count}")
+
+        lines.append("# TYPE katbot_command_errors_total counter")
+        for (command, error), count in self.errors.items():
+            lines.append(f"katbot_command_errors_total{prom_labels(command=command, error=error)} {count}")
+
+        lines.append("# TYPE katbot_command_cancelled_total counter")
+        for command, count in self.cancelled.items():
+            lines.append(f"katbot_command_cancelled_total{prom_labels(command=command)} {count}")
+
+        lines.append("# TYPE katbot_command_seconds histogram")
+        for (command, phase), hist in self.latency.items():
+            self._render_histogram(lines, "katbot_command_seconds", hist, command=command, phase=phase)
+
+        lines.append("# TYPE katbot_output_bytes histogram")
+        for command, hist in self.output_size.items():
+            self._render_histogram(lines, "katbot_output_bytes", hist, command=command)
+
+        lines.append("# TYPE katbot_executor_queue_seconds histogram")
+        for pool, hist in self.executor_queue.items():
+            self._render_histogram(lines, "katbot_executor_queue_seconds", hist, pool=pool)
+
+        lines.append("")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _render_histogram(lines, name, hist, **labels):
+        cumulative = 0
+        for bound, count in zip(hist.buckets, hist.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{prom_labels(**labels, le=bound)} {cumulative}")
+        lines.append(f"{name}_bucket{prom_labels(**labels, le='+Inf')} {hist.count}")
+        lines.append(f"{name}_sum{prom_labels(**labels)} {hist.sum}")
+        lines.append(f"{name}_count{prom_labels(**labels)} {hist.count}")
+
+
+def write_file(path, text):
+    """Writes the file at once, so a scraper never reads half of it."""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
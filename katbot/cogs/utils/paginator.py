@@ -1,6 +1,4 @@
 import asyncio
-import concurrent.futures
-from contextlib import suppress
 from textwrap import TextWrapper
 
 import discord
@@ -22,6 +20,80 @@ class WrappedPaginator(commands.Paginator):
             super().add_line(line, empty=empty)
 
 
+def iter_pages(paginator, text):
+    """
+    Yields the pages of `text` as soon as the paginator closes them,
+    instead of wrapping the whole text before the first one.
+    """
+    for line in text.split('\n'):
+        paginator.add_line(line)
+        if paginator._pages:
+            yield from paginator._pages
+            paginator._pages.clear()
+    yield from paginator.pages
+
+
+class LazyEntries:
+    """
+    The entries of a paginator pulled from an iterator or an async iterator,
+    only when a page needs them. The pulled ones are kept.
+    """
+
+    def __init__(self, source):
+        if hasattr(source, "__aiter__"):
+            self._aiter = source.__aiter__()
+            self._iter = None
+        else:
+            self._aiter = None
+            self._iter = iter(source)
+        self._entries = []
+        self.exhausted = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getitem__(self, item):
+        return self._entries[item]
+
+    async def fill(self, count=None):
+        """Pulls entries until there are `count` of them (all of them if None)."""
+        while not self.exhausted and (count is None or len(self._entries) < count):
+            try:
+                if self._aiter is not None:
+                    entry = await self._aiter.__anext__()
+                else:
+                    entry = next(self._iter)
+            except (StopIteration, StopAsyncIteration):
+                self.exhausted = True
+            else:
+                self._entries.append(entry)
+
+
+class PaginatorRegistry:
+    """
+    The live paginators, by the id of their message. The bot sends
+    the raw reaction events to it, and they are put in the queue of
+    the paginator of the message (if there is one).
+    """
+
+    def __init__(self):
+        self._sessions = {}
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def register(self, message_id, queue):
+        self._sessions[message_id] = queue
+
+    def unregister(self, message_id):
+        self._sessions.pop(message_id, None)
+
+    def dispatch(self, payload):
+        queue = self._sessions.get(payload.message_id)
+        if queue is not None:
+            queue.put_nowait(payload)
+
+
 class Pages:
     """Implements a paginator that queries the user for the
     pagination interface.
@@ -36,9 +108,12 @@ class Pages:
     ctx: Context
         The context of the command.
     entries: List[str]
-        A list of entries to paginate.
+        A list of entries to paginate. An iterator or an async iterator
+        can also be given, its entries are then pulled when needed.
     per_page: int
         How many entries show up per page.
+    look_ahead: int
+        How many pages are pulled in advance from an iterator.
     show_entry_count: bool
         Whether to show an entry count in the footer.
     text_paginator: bool
@@ -56,19 +131,20 @@ class Pages:
         Our permissions for the channel.
     """
 
-    def __init__(self, ctx, *, entries, per_page=12, show_entry_count=True, text_paginator=False, stop_deletes=False):
+    def __init__(self, ctx, *, entries, per_page=12, show_entry_count=True, text_paginator=False, stop_deletes=False,
+                 look_ahead=1):
         self.bot = ctx.bot
-        self.entries = entries
+        self.lazy = not hasattr(entries, "__len__")
+        self.entries = LazyEntries(entries) if self.lazy else entries
         self.message = ctx.message
         self.channel = ctx.channel
         self.author = ctx.author
         self.per_page = per_page
-        pages, left_over = divmod(len(self.entries), self.per_page)
-        if left_over:
-            pages += 1
-        self.maximum_pages = pages
+        self.look_ahead = look_ahead
+        self.update_maximum_pages()
         self.embed = discord.Embed(colour=EMBED_COLOUR)
-        self.paginating = len(entries) > per_page
+        # we can't know yet with an iterator, see paginate
+        self.paginating = self.lazy or len(entries) > per_page
         self.show_entry_count = show_entry_count
         self.text_paginator = text_paginator
         self.stop_deletes = stop_deletes
@@ -111,6 +187,32 @@ class Pages:
                 self.bot.new_task(self.author.create_dm())
             self.channel = self.author.dm_channel
 
+    def update_maximum_pages(self):
+        pages, left_over = divmod(len(self.entries), self.per_page)
+        if left_over:
+            pages += 1
+        self.maximum_pages = pages
+
+    @property
+    def pages_known(self):
+        return not self.lazy or self.entries.exhausted
+
+    @property
+    def maximum_pages_text(self):
+        return str(self.maximum_pages) if self.pages_known else "?"
+
+    async def load_page(self, page=None):
+        """
+        Pulls the entries up to `page` (and the look-ahead) from the iterator, all of them if None.
+        """
+        if not self.lazy or self.entries.exhausted:
+            return
+        if page is None:
+            await self.entries.fill()
+        else:
+            await self.entries.fill((page + self.look_ahead) * self.per_page)
+        self.update_maximum_pages()
+
     def get_page(self, page):
         base = (page - 1) * self.per_page
         return self.entries[base:base + self.per_page]
@@ -128,10 +230,10 @@ class Pages:
             p.append(f'{index}. {entry}')
 
         if self.maximum_pages > 1:
-            if self.show_entry_count:
+            if self.show_entry_count and self.pages_known:
                 text = f'Page {page}/{self.maximum_pages} ({len(self.entries)} entrées)'
             else:
-                text = f'Page {page}/{self.maximum_pages}'
+                text = f'Page {page}/{self.maximum_pages_text}'
 
             self.embed.set_footer(text=text)
 
@@ -142,6 +244,7 @@ class Pages:
         self.embed.description = '\n'.join(p)
 
     async def show_page(self, page, *, first=False):
+        await self.load_page(page)
         self.current_page = page
         entries = self.get_page(page)
         content = self.get_content(entries, page, first=first)  # pylint: disable=assignment-from-none
@@ -156,16 +259,28 @@ class Pages:
             return
 
         self.message = await self.channel.send(content=content, embed=embed)
+        # in the background, the session can be used while they get added
+        self.bot.new_task(self.add_reactions())
+
+    async def add_reactions(self):
+        # One after the other, their order matters (and discord.py waits for the ratelimits)
         for (reaction, _) in self.reaction_emojis:
-            if self.maximum_pages == 2 and reaction in ('\u23ed', '\u23ee'):
+            if not self.paginating:
+                return
+            if self.pages_known and self.maximum_pages == 2 and reaction in ('\u23ed', '\u23ee'):
                 # no |<< or >>| buttons if we only have two pages
                 # we can't forbid it if someone ends up using it but remove
                 # it from the default set
                 continue
 
-            await self.message.add_reaction(reaction)
+            try:
+                await self.message.add_reaction(reaction)
+            except discord.HTTPException:
+                # deleted, or no permission to add reactions
+                return
 
     async def checked_show_page(self, page):
+        await self.load_page(page)
         if page != 0 and page <= self.maximum_pages:
             await self.show_page(page)
 
@@ -175,6 +290,7 @@ class Pages:
 
     async def last_page(self):
         """Va à la dernière page"""
+        await self.load_page()
         await self.show_page(self.maximum_pages)
 
     async def next_page(self):
@@ -207,10 +323,13 @@ class Pages:
         else:
             page = int(msg.content)
             to_delete.append(msg)
+            await self.load_page(page)
             if page != 0 and page <= self.maximum_pages:
                 await self.show_page(page)
             else:
-                to_delete.append(await self.channel.send(f"Cette page n'existe pas. ({page}/{self.maximum_pages})"))
+                to_delete.append(
+                    await self.channel.send(f"Cette page n'existe pas. ({page}/{self.maximum_pages_text})")
+                )
                 await asyncio.sleep(5)
 
         try:
@@ -251,42 +370,50 @@ class Pages:
             for react, _ in self.reaction_emojis:
                 await self.message.remove_reaction(react, self.bot.user)
 
-    def react_check(self, reaction, user):
-        if user is None or user.id != self.author.id:
+    def react_check(self, payload):
+        if payload.user_id != self.author.id:
             return False
 
-        if reaction.message.id != self.message.id:
+        if payload.message_id != self.message.id:
             return False
 
-        for (emoji, func) in self.reaction_emojis:
-            if reaction.emoji == emoji:
+        emoji = str(payload.emoji)
+        for (reaction, func) in self.reaction_emojis:
+            if reaction == emoji:
                 self.match = func
                 return True
         return False
 
     async def paginate(self):
         """Actually paginate the entries and run the interactive loop if necessary."""
-        first_page = self.show_page(1, first=True)
-        if not self.paginating:
-            await first_page
-            if self.text_paginator and self.stop_deletes:
-                # react with stop emoji since we would eventually
-                # want to delete the paginator message
-                await self.message.add_reaction(self.reaction_emojis[5][0])
-        else:
-            # allow us to react to reactions right away if we're paginating
-            self.bot.new_task(first_page)
+        if self.lazy:
+            await self.load_page(1)
+            self.paginating = self.maximum_pages > 1
 
-        while self.paginating or self.stop_deletes:
-            done, pending = await asyncio.wait(
-                [
-                    self.bot.wait_for("reaction_add", check=self.react_check, timeout=120.0),
-                    self.bot.wait_for("reaction_remove", check=self.react_check, timeout=120.0)
-                ],
-                return_when=asyncio.FIRST_COMPLETED)
+        await self.show_page(1, first=True)
+        if not self.paginating and self.text_paginator and self.stop_deletes:
+            # react with stop emoji since we would eventually
+            # want to delete the paginator message
+            await self.message.add_reaction(self.reaction_emojis[5][0])
+
+        if not (self.paginating or self.stop_deletes):
+            return
+
+        # the reactions to the message are sent here by the bot
+        queue = asyncio.Queue()
+        self.bot.paginators.register(self.message.id, queue)
+        try:
+            await self.wait_reactions(queue)
+        finally:
+            self.bot.paginators.unregister(self.message.id)
+
+    async def wait_reactions(self, queue):
+        loop = self.bot.loop
+        deadline = loop.time() + 120.0
 
+        while self.paginating or self.stop_deletes:
             try:
-                done.pop().result()
+                payload = await asyncio.wait_for(queue.get(), deadline - loop.time())
             except asyncio.TimeoutError:
                 try:
                     if not self.stop_deletes:
@@ -294,12 +421,11 @@ class Pages:
                 except discord.NotFound:
                     pass
                 break
-            else:
-                for fut in pending:
-                    # TODO: fix
-                    with suppress(concurrent.futures.TimeoutError()):
-                        fut.cancel()
 
+            if not self.react_check(payload):
+                continue
+
+            deadline = loop.time() + 120.0
             await self.match()
 
 
@@ -316,25 +442,23 @@ class FieldPages(Pages):
             self.embed.add_field(name=key, value=value, inline=False)
 
         if self.maximum_pages > 1:
-            if self.show_entry_count:
+            if self.show_entry_count and self.pages_known:
                 text = f'Page {page}/{self.maximum_pages} ({len(self.entries)} entrée(s))'
             else:
-                text = f'Page {page}/{self.maximum_pages}'
+                text = f'Page {page}/{self.maximum_pages_text}'
 
             self.embed.set_footer(text=text)
 
 
 class TextPages(Pages):
-    """Uses a WrappedPaginator internally to paginate some text."""
+    """Uses a WrappedPaginator internally to paginate some text, as the pages are shown."""
 
     def __init__(self, ctx, text, *, prefix='```', suffix='```', max_size=2000, stop_deletes=False):
         paginator = WrappedPaginator(prefix=prefix, suffix=suffix, max_size=max_size - 200)
-        for line in text.split('\n'):
-            paginator.add_line(line)
 
         super().__init__(
             ctx,
-            entries=paginator.pages,
+            entries=iter_pages(paginator, text),
             per_page=1,
             show_entry_count=False,
             text_paginator=True,
@@ -349,13 +473,20 @@ class TextPages(Pages):
 
     def get_content(self, entry, page, *, first=False):
         if self.maximum_pages > 1:
-            return f'{entry}\nPage {page}/{self.maximum_pages}'
+            return f'{entry}\nPage {page}/{self.maximum_pages_text}'
         return entry
 
 
+def help_field(command):
+    """The (name, value) of the field of a command in the help."""
+    return f'{command.qualified_name} {command.signature}', command.short_doc or "Pas d'aide precisée"
+
+
 class HelpPaginator(Pages):
-    def __init__(self, help_command, ctx, entries, *, per_page=4):
+    def __init__(self, help_command, ctx, entries, *, per_page=4, fields=None):
         super().__init__(ctx, entries=entries, per_page=per_page)
+        # already rendered fields, by command
+        self.fields = fields or {}
         self.reaction_emojis.append(('\N{WHITE QUESTION MARK ORNAMENT}', self.show_bot_help))
         self.total = len(entries)
         self.help_command = help_command
@@ -378,8 +509,8 @@ class HelpPaginator(Pages):
         self.embed.set_footer(text=f'Utilise "{self.prefix}help commande" pour plus d\'infos sur une commande.')
 
         for entry in entries:
-            signature = f'{entry.qualified_name} {entry.signature}'
-            self.embed.add_field(name=signature, value=entry.short_doc or "Pas d'aide precisée", inline=False)
+            name, value = self.fields.get(entry) or help_field(entry)
+            self.embed.add_field(name=name, value=value, inline=False)
 
         if self.maximum_pages:
             self.embed.set_author(name=f'Page {page}/{self.maximum_pages} ({self.total} commandes)')
@@ -0,0 +1,247 @@
+import asyncio
+import concurrent.futures
+import functools
+import multiprocessing
+import os
+import threading
+import time
+
+CPU_COUNT = os.cpu_count() or 1
+
+THREAD_WORKERS = min(32, CPU_COUNT + 4)
+PROCESS_WORKERS = CPU_COUNT
+
+# The default time limit of the cancellable jobs
+JOB_TIMEOUT = 30
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class CancelToken:
+    """
+    Given to the cancellable jobs (as `token`), which `check` it in their
+    long loops: it gets cancelled when the result isn't wanted anymore,
+    or once past its `deadline` (a `time.time()`).
+    """
+    __slots__ = ("event", "deadline")
+
+    def __init__(self, event=None, deadline=None):
+        self.event = event
+        self.deadline = deadline
+
+    @property
+    def expired(self):
+        return self.deadline is not None and time.time() > self.deadline
+
+    @property
+    def cancelled(self):
+        return (self.event is not None and self.event.is_set()) or self.expired
+
+    def cancel(self):
+        if self.event is not None:
+            self.event.set()
+
+    def check(self):
+        if self.expired:
+            raise JobCancelled("Le traitement a pris trop de temps.")
+        if self.cancelled:
+            raise JobCancelled("Le traitement a été annulé.")
+
+
+# For the jobs that are called without a token
+NEVER = CancelToken()
+
+
+def cpu_bound(func):
+    """
+    Marks a function as CPU bound, so that it gets run in the process pool.
+    """
+    func.cpu_bound = True
+    return func
+
+
+def cancellable(func):
+    """
+    Marks a function as taking a `token` kwarg (a `CancelToken`) that it checks.
+    """
+    func.cancellable = True
+    return func
+
+
+def _timed_call(func, args, kwargs):
+    # Runs in the worker (thread or process), so we use wall clock time
+    # to be able to compare it with the time of submission.
+    token = kwargs.get("token")
+    if token is not None:
+        # no need to start it if it got cancelled while waiting
+        token.check()
+    started = time.time()
+    res = func(*args, **kwargs)
+    return started, time.time(), res
+
+
+def _warmup():
+    return os.getpid()
+
+
+class PoolStats:
+    __slots__ = ("submitted", "done", "failed", "wait_total", "wait_max", "run_total", "run_max")
+
+    def __init__(self):
+        self.submitted = 0
+        self.done = 0
+        self.failed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.run_total = 0.0
+        self.run_max = 0.0
+
+    @property
+    def queued(self):
+        """Jobs that are submitted but not finished yet."""
+        return self.submitted - self.done - self.failed
+
+    def record(self, wait, run):
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self.run_total += run
+        self.run_max = max(self.run_max, run)
+
+    def fmt(self):
+        finished = self.done or 1
+        return (
+            f"soumis: {self.submitted} | en cours: {self.queued} | echecs: {self.failed}\n"
+            f"  attente: moy {self.wait_total / finished * 1000:.1f}ms, max {self.wait_max * 1000:.1f}ms\n"
+            f"  execution: moy {self.run_total / finished * 1000:.1f}ms, max {self.run_max * 1000:.1f}ms"
+        )
+
+
+class Pools:
+    """
+    The executors of the bot, they live as long as it.
+
+    Functions marked with `cpu_bound` are run in a pre-forked process pool,
+    everything else goes to a thread pool.
+
+    A process can't be stopped from the outside without breaking the pool,
+    so the functions marked with `cancellable` get a token to check instead
+    (its event lives in a manager, for the processes).
+    """
+
+    def __init__(self, loop, *, threads=THREAD_WORKERS, processes=PROCESS_WORKERS, metrics=None):
+        self.loop = loop
+        self.threads = threads
+        self.processes = processes
+        self.metrics = metrics
+
+        self.thread_pool = None
+        self.process_pool = None
+        self.manager = None
+        self.stats = {"thread": PoolStats(), "process": PoolStats()}
+
+    async def start(self):
+        if self.thread_pool is None:
+            self.thread_pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.threads,
+                thread_name_prefix="katbot"
+            )
+        if self.manager is None:
+            # it starts its server process, not on the loop
+            self.manager = await self.loop.run_in_executor(self.thread_pool, multiprocessing.Manager)
+        if self.process_pool is None:
+            await self._fork_processes()
+
+    def _fork_processes(self):
+        self.process_pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.processes)
+        # Fork every worker now, so the first commands don't pay for it
+        return asyncio.gather(*[
+            self.loop.run_in_executor(self.process_pool, _warmup)
+            for _ in range(self.processes)
+        ])
+
+    async def restart_processes(self):
+        """
+        Replaces the process pool (the old one finishes its jobs), for when the
+        code of its functions got reloaded: the workers still have the old one.
+        """
+        if self.process_pool is None:
+            # not started yet
+            return
+        old = self.process_pool
+        warmup = self._fork_processes()
+        old.shutdown(wait=False)
+        await warmup
+
+    def shutdown(self):
+        if self.thread_pool is not None:
+            self.thread_pool.shutdown(wait=False)
+            self.thread_pool = None
+        if self.process_pool is not None:
+            self.process_pool.shutdown(wait=False)
+            self.process_pool = None
+        if self.manager is not None:
+            self.manager.shutdown()
+            self.manager = None
+
+    def route(self, func, thread=None):
+        if thread is None:
+            thread = not getattr(func, "cpu_bound", False)
+        return "thread" if thread else "process"
+
+    def token(self, kind, timeout=None):
+        event = threading.Event() if kind == "thread" else self.manager.Event()
+        return CancelToken(event, time.time() + timeout if timeout else None)
+
+    async def run(self, func, *args, _thread=None, _timeout=JOB_TIMEOUT, **kwargs):
+        """
+        Runs `func` in its pool (see `route` for `_thread`), the kwargs are for it.
+        If it is `cancellable`, it gets a token, which is cancelled if this
+        gets cancelled or after `_timeout` seconds.
+        """
+        kind = self.route(func, _thread)
+        if kind == "thread":
+            pool = self.thread_pool
+        else:
+            pool = self.process_pool
+        stats = self.stats[kind]
+
+        token = None
+        if getattr(func, "cancellable", False):
+            token = kwargs["token"] = self.token(kind, _timeout)
+
+        stats.submitted += 1
+        submitted = time.time()
+        try:
+            fut = self.loop.run_in_executor(
+                pool,
+                functools.partial(_timed_call, func, args, kwargs)
+            )
+            if token is None:
+                started, ended, res = await fut
+            else:
+                started, ended, res = await asyncio.wait_for(fut, _timeout)
+        except asyncio.TimeoutError:
+            stats.failed += 1
+            token.cancel()
+            raise JobCancelled("Le traitement a pris trop de temps.") from None
+        except BaseException:
+            stats.failed += 1
+            if token is not None:
+                # it stops at its next check
+                token.cancel()
+            raise
+
+        stats.done += 1
+        wait = max(0.0, started - submitted)
+        stats.record(wait, ended - started)
+        if self.metrics is not None:
+            self.metrics.observe_queue(kind, wait)
+        return res
+
+    def fmt_stats(self):
+        return "\n".join([
+            f"Threads ({self.threads}):\n  {self.stats['thread'].fmt()}",
+            f"Processus ({self.processes}):\n  {self.stats['process'].fmt()}"
+        ])
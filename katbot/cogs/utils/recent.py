@@ -0,0 +1,140 @@
+from collections import OrderedDict, deque
+
+IMAGE_FORMATS = ('png', 'jpg', 'jpeg', 'webp', 'gif')
+
+
+def check_extension(url):
+    extension = url.rpartition('.')[-1].lower()
+    if extension not in IMAGE_FORMATS:
+        return
+    return extension
+
+
+def find_image(m, *, invoking=False):
+    """
+    Returns the url of the image of a message, if it has one.
+    `invoking` is for the message of a command, where urls used as arguments are ignored.
+    """
+    # check attachments (files uploaded to discord)
+    for attachment in m.attachments:
+        extension = check_extension(attachment.filename)
+        if not extension:
+            continue
+        return attachment.url
+
+    # check embeds (user posted url / bot posted rich embed)
+    for embed in m.embeds:
+        if embed.image:
+            extension = check_extension(embed.image.proxy_url)
+            if extension:
+                return embed.image.proxy_url
+
+        # bot condition because we do not want image from
+        # rich embed thumbnail
+        if not embed.thumbnail or (m.author.bot and embed.type == "rich"):
+            continue
+
+        # avoid case when image embed was created from url that is
+        # used as argument or flag
+        if invoking:
+            if embed.thumbnail.url in m.content:
+                continue
+
+        extension = check_extension(embed.thumbnail.proxy_url)
+        if not extension:
+            continue
+
+        return embed.thumbnail.proxy_url
+
+
+class _ChannelImages:
+    __slots__ = ("images", "filled")
+
+    def __init__(self, per_channel):
+        # (message id, url), the newest on the right
+        self.images = deque(maxlen=per_channel)
+        # if we got the history of the channel, and not only what we saw since we started
+        self.filled = False
+
+
+class RecentImages:
+    """
+    Keeps the last messages with an image of each channel, fed by the message events,
+    so that the image commands don't need to fetch the history of the channel.
+    """
+
+    def __init__(self, *, per_channel=5, max_channels=5000):
+        self.per_channel = per_channel
+        self.max_channels = max_channels
+        self._channels = OrderedDict()
+
+    def _get(self, channel_id, create=False):
+        channel = self._channels.get(channel_id)
+        if channel is None:
+            if not create:
+                return None
+            channel = self._channels[channel_id] = _ChannelImages(self.per_channel)
+            if len(self._channels) > self.max_channels:
+                self._channels.popitem(last=False)
+        else:
+            self._channels.move_to_end(channel_id)
+        return channel
+
+    def add(self, message):
+        url = find_image(message)
+        if url:
+            self._get(message.channel.id, create=True).images.append((message.id, url))
+
+    def update(self, message):
+        """For edited messages (embeds are often added this way)."""
+        url = find_image(message)
+        channel = self._get(message.channel.id, create=bool(url))
+        if channel is None:
+            return
+
+        images = [i for i in channel.images if i[0] != message.id]
+        if url:
+            images = sorted([*images, (message.id, url)])
+        self._replace(channel, images)
+
+    def remove(self, channel_id, *message_ids):
+        channel = self._channels.get(channel_id)
+        if channel is None:
+            return
+        images = [i for i in channel.images if i[0] not in message_ids]
+        self._replace(channel, images)
+
+    @staticmethod
+    def _replace(channel, images):
+        if images == list(channel.images):
+            return
+        channel.images.clear()
+        channel.images.extend(images)
+        if not images:
+            # there might be older images that we don't know of
+            channel.filled = False
+
+    def fill(self, channel_id, messages):
+        """
+        Adds the images of messages fetched from the history of a channel.
+        """
+        channel = self._get(channel_id, create=True)
+        found = [(m.id, find_image(m)) for m in messages]
+        images = sorted({*channel.images, *[i for i in found if i[1]]})
+        channel.images.clear()
+        channel.images.extend(images)
+        channel.filled = True
+
+    def latest(self, channel_id, before):
+        """
+        Returns if we know the channel, and the url of the last image before the message id `before`.
+        """
+        channel = self._get(channel_id)
+        if channel is None or not channel.filled:
+            return False, None
+
+        for message_id, url in reversed(channel.images):
+            if message_id < before:
+                return True, url
+        # if all the images we kept are too recent, older ones might exist
+        return len(channel.images) < channel.images.maxlen, None
@@ -0,0 +1,244 @@
+import asyncio
+import time
+from collections import OrderedDict, defaultdict, deque
+
+from .pools import PROCESS_WORKERS
+
+# How many jobs run at the same time, whatever the guild
+MAX_RUNNING = PROCESS_WORKERS
+# Over this many waiting jobs, new ones are refused
+MAX_QUEUED = 25
+# Jobs (running or waiting) a user can have at the same time
+MAX_PER_USER = 2
+
+
+class SchedulerFull(Exception):
+    pass
+
+
+class _Waiter:
+    __slots__ = ("guild_id", "user_id", "cheap", "weight", "wakeup", "granted")
+
+    def __init__(self, guild_id, user_id, cheap, weight):
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self.cheap = cheap
+        self.weight = weight
+        self.wakeup = None
+        self.granted = False
+
+
+class _Queue:
+    """Waiting jobs, served one guild after the other."""
+
+    def __init__(self):
+        # guild id: deque of waiters, in the order the guilds get served
+        self.guilds = OrderedDict()
+
+    def __len__(self):
+        return sum(len(q) for q in self.guilds.values())
+
+    def push(self, waiter):
+        self.guilds.setdefault(waiter.guild_id, deque()).append(waiter)
+
+    def first(self):
+        return next(iter(self.guilds.values()))[0]
+
+    def pop(self):
+        guild_id, queue = next(iter(self.guilds.items()))
+        waiter = queue.popleft()
+        # the guild goes back at the end of the round
+        del self.guilds[guild_id]
+        if queue:
+            self.guilds[guild_id] = queue
+        return waiter
+
+    def remove(self, waiter):
+        queue = self.guilds[waiter.guild_id]
+        queue.remove(waiter)
+        if not queue:
+            del self.guilds[waiter.guild_id]
+
+    def position(self, waiter):
+        """How many of these waiters get served before `waiter`."""
+        index = self.guilds[waiter.guild_id].index(waiter)
+        ahead = 0
+        before = True
+        for guild_id, queue in self.guilds.items():
+            if guild_id == waiter.guild_id:
+                before = False
+                ahead += index
+            else:
+                ahead += min(len(queue), index + 1 if before else index)
+        return ahead
+
+    def __iter__(self):
+        for queue in self.guilds.values():
+            yield from queue
+
+
+class Scheduler:
+    """
+    Runs the heavy jobs of the commands (see `slot`) at most `max_running`
+    at a time. The waiting jobs are served guild after guild, so one busy
+    guild doesn't hold up the others, and the cheap jobs (the ones not
+    marked `cpu_bound`) before the others.
+    """
+
+    def __init__(self, loop, *, max_running=MAX_RUNNING, max_queued=MAX_QUEUED,
+                 max_per_user=MAX_PER_USER, metrics=None):
+        self.loop = loop
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self.max_per_user = max_per_user
+        self.metrics = metrics
+
+        self.running = 0
+        self.cheap = _Queue()
+        self.heavy = _Queue()
+        self.per_user = defaultdict(int)
+        # message id of the command: slots waited for or in use
+        self.slots = defaultdict(set)
+        self.rejected = 0
+        self.cancelled = 0
+
+    @property
+    def queued(self):
+        return len(self.cheap) + len(self.heavy)
+
+    def position(self, waiter):
+        if waiter.cheap:
+            return self.cheap.position(waiter)
+        return len(self.cheap) + self.heavy.position(waiter)
+
+    def slot(self, ctx, func, load=None, *, weight=1):
+        """
+        Async context manager, waiting for a slot to run `func` for the command
+        of `ctx`. The position in the queue is shown with `load.update`.
+        A job running on several workers at once takes `weight` slots.
+        Raises SchedulerFull if there are too many jobs.
+        """
+        return _Slot(self, ctx, func, load, min(weight, self.max_running))
+
+    def cancel(self, message_id):
+        """
+        Cancels the jobs of the command of this message (waiting or running),
+        their slots are freed right away.
+        """
+        slots = self.slots.pop(message_id, ())
+        for slot in slots:
+            # so the command doesn't count as a success
+            slot.ctx.job_cancelled = True
+            slot.task.cancel()
+        self.cancelled += len(slots)
+        return len(slots)
+
+    def _enter(self, waiter):
+        if self.per_user.get(waiter.user_id, 0) >= self.max_per_user:
+            self.rejected += 1
+            raise SchedulerFull("Tu as déjà des traitements en cours, attends qu'ils finissent.")
+
+        if self.running + waiter.weight <= self.max_running and not self.queued:
+            waiter.granted = True
+            self.running += waiter.weight
+        elif self.queued >= self.max_queued:
+            self.rejected += 1
+            raise SchedulerFull("Il y a trop de traitements en attente, réessaie dans quelques instants.")
+        else:
+            (self.cheap if waiter.cheap else self.heavy).push(waiter)
+            # a cheap one can run now, even when a heavy one waits for more
+            # slots, and the others can be moved (cheap, or from another guild)
+            self._dispatch()
+        self.per_user[waiter.user_id] += 1
+
+    def _leave(self, waiter):
+        if waiter.granted:
+            self.running -= waiter.weight
+        else:
+            (self.cheap if waiter.cheap else self.heavy).remove(waiter)
+
+        self.per_user[waiter.user_id] -= 1
+        if not self.per_user[waiter.user_id]:
+            del self.per_user[waiter.user_id]
+        self._dispatch()
+
+    def _dispatch(self):
+        while self.queued:
+            queue = self.cheap if self.cheap.guilds else self.heavy
+            if self.running + queue.first().weight > self.max_running:
+                break
+            waiter = queue.pop()
+            waiter.granted = True
+            self.running += waiter.weight
+            self._wake(waiter)
+
+        # everyone else moved in the queue
+        self._wake_all()
+
+    def _wake_all(self):
+        for waiter in list(self.cheap) + list(self.heavy):
+            self._wake(waiter)
+
+    @staticmethod
+    def _wake(waiter):
+        if waiter.wakeup is not None and not waiter.wakeup.done():
+            waiter.wakeup.set_result(None)
+
+    def fmt(self):
+        return (
+            f"en cours: {self.running}/{self.max_running} | "
+            f"en attente: {self.queued} ({len(self.cheap)} légers) | "
+            f"refusés: {self.rejected} | annulés: {self.cancelled}"
+        )
+
+
+class _Slot:
+    __slots__ = ("scheduler", "ctx", "load", "waiter", "task")
+
+    def __init__(self, scheduler, ctx, func, load, weight):
+        self.scheduler = scheduler
+        self.ctx = ctx
+        self.load = load
+        self.task = None
+        guild_id = ctx.guild.id if ctx.guild else None
+        self.waiter = _Waiter(guild_id, ctx.author.id, not getattr(func, "cpu_bound", False), weight)
+
+    async def __aenter__(self):
+        scheduler, waiter = self.scheduler, self.waiter
+        scheduler._enter(waiter)
+        self.task = asyncio.current_task()
+        scheduler.slots[self.ctx.message.id].add(self)
+        if waiter.granted:
+            return
+
+        started = time.perf_counter()
+        shown = None
+        try:
+            while not waiter.granted:
+                # created first, to not miss a move while the message gets edited
+                waiter.wakeup = scheduler.loop.create_future()
+                position = scheduler.position(waiter) + 1
+                if self.load is not None and position != shown:
+                    shown = position
+                    await self.load.update(f"En file d'attente (position {position})...")
+                if not waiter.granted:
+                    await waiter.wakeup
+
+            if scheduler.metrics is not None and self.ctx.command is not None:
+                scheduler.metrics.observe(self.ctx.command.qualified_name, "queue", time.perf_counter() - started)
+            if self.load is not None:
+                await self.load.update("Traitement...")
+        except BaseException:
+            self._leave()
+            raise
+
+    async def __aexit__(self, type_, value, traceback):
+        self._leave()
+
+    def _leave(self):
+        slots = self.scheduler.slots.get(self.ctx.message.id)
+        if slots is not None:
+            slots.discard(self)
+            if not slots:
+                del self.scheduler.slots[self.ctx.message.id]
+        self.scheduler._leave(self.waiter)
@@ -0,0 +1,88 @@
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+
+
+class DeletedMessage:
+    __slots__ = ("message_id", "author_id", "author_name", "author_avatar", "content", "image", "timestamp")
+
+    def __init__(self, message):
+        self.message_id = message.id
+        # only what we need to show it, not the whole member
+        self.author_id = message.author.id
+        self.author_name = str(message.author)
+        self.author_avatar = str(message.author.avatar_url_as(format="png"))
+        self.content = message.content
+
+        self.image = None
+        if message.attachments:
+            att = message.attachments[0]
+            if att.width:
+                self.image = att.proxy_url
+
+        self.timestamp = datetime.utcnow()
+
+
+class SnipeStore:
+    """
+    The last deleted messages of each channel (`per_channel` of them).
+
+    There are at most `max_records` of them in total: the ones of the channels
+    with the oldest deletions go first. They are also forgotten after `ttl`.
+    """
+
+    def __init__(self, *, per_channel=10, max_records=20000, ttl=timedelta(days=1)):
+        self.per_channel = per_channel
+        self.max_records = max_records
+        self.ttl = ttl
+
+        # channel id: deque of DeletedMessage, the newest on the right
+        self._channels = OrderedDict()
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, message):
+        channel_id = message.channel.id
+        records = self._channels.get(channel_id)
+        if records is None:
+            records = self._channels[channel_id] = deque(maxlen=self.per_channel)
+        else:
+            self._channels.move_to_end(channel_id)
+
+        if len(records) < records.maxlen:
+            self.count += 1
+        records.append(DeletedMessage(message))
+        self._evict()
+
+    def _expire(self, records):
+        limit = datetime.utcnow() - self.ttl
+        while records and records[0].timestamp < limit:
+            records.popleft()
+            self.count -= 1
+
+    def _evict(self):
+        # the least recently used channels have the oldest deletions
+        while self._channels:
+            channel_id, records = next(iter(self._channels.items()))
+            self._expire(records)
+            if records and self.count > self.max_records:
+                records.popleft()
+                self.count -= 1
+            if not records:
+                del self._channels[channel_id]
+            elif self.count <= self.max_records:
+                break
+
+    def recent(self, channel_id):
+        """
+        Returns the deleted messages of a channel, the newest first.
+        """
+        records = self._channels.get(channel_id)
+        if records is None:
+            return []
+
+        self._expire(records)
+        if not records:
+            del self._channels[channel_id]
+        return list(reversed(records))